@@ -26,6 +26,8 @@ Note (2):
 
 ###############################################################################
 # Import packages:
+import time
+
 import xarray as xr
 import numpy as np
 
@@ -52,6 +54,10 @@ yearEnd = 2003
 
 neof = 3  # number of EOFs
 
+# EOF solver: 'full' uses geocat.comp's eofunc/eofunc_ts, 'randomized' uses the
+# truncated solver defined below, whose memory use only grows with space x neof
+eof_solver = 'full'
+
 # Set to True to activate diagnostic print statements throughout the code
 debug = False
 
@@ -65,7 +71,8 @@ def print_debug(message):
 ###############################################################################
 # Read in data:
 
-# Open a netCDF data file using xarray default engine and load the data into xarrays
+# Open a netCDF data file using xarray default engine.  Only the metadata is read here; the values are read from
+# disk later, and only for the region and time span that are actually used.
 ds = xr.open_dataset(gdf.get('netcdf_files/slp.mon.mean.nc'))
 
 # Print a content summary
@@ -73,76 +80,109 @@ print_debug('\n\nds.slp.attrs:\n')
 print_debug(ds.slp.attrs)
 
 ###############################################################################
-# Flip and sort longitude coordinates:
+# Limit data to the specified years:
 
-# To facilitate data subsetting
+startDate = f'{yearStart}-01-01'
+endDate = f'{yearEnd}-12-01'
 
-print_debug(f'\n\nBefore flip, longitude range is [{ds["lon"].min().data}, {ds["lon"].max().data}].')
+ds = ds.sel(time=slice(startDate, endDate))
+print_debug('\n\nds:\n\n')
+print_debug(ds)
+
+
+###############################################################################
+# Utility function:
 
-ds["lon"] = ((ds["lon"] + 180) % 360) - 180
+# Define a utility function that flips, sorts and subsets the data to a lat/lon box in one step
+def select_region(ds, latS, latN, lonL, lonR):
+    """ This function returns the part of ``ds`` within [latS, latN] x [lonL, lonR], with longitudes rearranged
+        to span -180 to 180 and both latitudes and longitudes in increasing order.
 
-# Sort longitudes, so that subset operations end up being simpler.
-ds = ds.sortby("lon")
+        Rather than flipping and sorting the whole globe and then subsetting it, the indices of the target box
+        are worked out from the coordinates alone and applied with a single isel().  On lazily loaded (or
+        dask-backed) data, only the values inside the box are ever read.
+    """
+    # Longitudes rearranged to span -180 to 180
+    lon = ((ds["lon"].values + 180) % 360) - 180
+    lon_idx = np.flatnonzero((lon >= lonL) & (lon <= lonR))
+    lon_idx = lon_idx[np.argsort(lon[lon_idx], kind='stable')]
+
+    # Latitudes in increasing order
+    lat = ds["lat"].values
+    lat_idx = np.flatnonzero((lat >= latS) & (lat <= latN))
+    lat_idx = lat_idx[np.argsort(lat[lat_idx], kind='stable')]
+
+    region = ds.isel(lat=lat_idx, lon=lon_idx)
+    return region.assign_coords(lon=("lon", lon[lon_idx], ds["lon"].attrs))
 
-print_debug(f'\n\nAfter flip, longitude range is [{ds["lon"].min().data}, {ds["lon"].max().data}].')
 
 ###############################################################################
-# Place latitudes in increasing order:
+# Subset data to the North Atlantic region:
 
-# To facilitate data subsetting
+print_debug(f'\n\nBefore flip, longitude range is [{ds["lon"].min().data}, {ds["lon"].max().data}].')
 
-ds = ds.sortby("lat", ascending=True)
+ds = select_region(ds, latS, latN, lonL, lonR)
 
-print_debug('\n\nAfter sorting latitude values, ds["lat"] is:')
+print_debug(f'\n\nAfter flip and subsetting, longitude range is [{ds["lon"].min().data}, {ds["lon"].max().data}].')
+print_debug('\n\nAfter sorting and subsetting, ds["lat"] is:')
 print_debug(ds["lat"])
 
+
 ###############################################################################
-# Limit data to the specified years:
+# Utility functions:
 
-startDate = f'{yearStart}-01-01'
-endDate = f'{yearEnd}-12-01'
+# Define utility functions for computing seasonal means (to mimmic NCL's month_to_season() and month_to_seasonN())
 
-ds = ds.sel(time=slice(startDate, endDate))
-print_debug('\n\nds:\n\n')
-print_debug(ds)
+# Middle month of each three-month season
+SEASON_CENTER_MONTHS = {'DJF': 1, 'JFM': 2, 'FMA': 3, 'MAM': 4, 'AMJ': 5, 'MJJ': 6,
+                        'JJA': 7, 'JAS': 8, 'ASO': 9, 'SON': 10, 'OND': 11, 'NDJ': 12}
 
 
-###############################################################################
-# Utility function:
+def month_to_seasons(xMon, seasons):
+    """ This function takes an xarray dataset containing contiguous monthly data spanning years and
+        returns a dictionary mapping each of the specified three-month seasons to a dataset with one
+        sample per year.
+
+        All seasons are computed in a single pass over the data: a centered three-month rolling sum of the
+        values (and of the number of valid values) gives the mean of every three-month window, labelled with
+        its middle month.  Each season then just selects its middle month, e.g. seasons=['DJF'] returns the
+        January timestamps.  On dask-backed data the rolling sums are computed chunk by chunk.
+
+        As for NCL's month_to_season(), a season whose middle month falls outside the original range of
+        monthly values is dropped, while a season at either end of the range that only has some of its
+        months available is averaged over those.  For example, if the monthly data's time range is
+        [Jan-2000, Dec-2003] and the season is "DJF", the first value is the mean of Jan-2000 and Feb-2000,
+        and there is no value for Dec-2003.
+    """
+    for season in seasons:
+        if season not in SEASON_CENTER_MONTHS:
+            raise ValueError("contributed: month_to_season: bad season: SEASON = " + season)
+
+    # Three-month means centered on every month, using only the months that are present
+    window = xMon.rolling(time=3, center=True, min_periods=1)
+    counts = xMon.notnull().rolling(time=3, center=True, min_periods=1).sum()
+    xMeans = window.sum() / counts
+
+    # Keep the attributes of the monthly data, like resample().mean() does
+    for name in xMeans.data_vars:
+        xMeans[name].attrs = xMon[name].attrs
+
+    # Filter just the desired seasons by their middle month
+    months = xMeans.time.dt.month
+    return {season: xMeans.sel(time=months == SEASON_CENTER_MONTHS[season]) for season in seasons}
+
 
-# Define a utility function for computing seasonal means (to mimmic NCL's month_to_season())
 def month_to_season(xMon, season):
     """ This function takes an xarray dataset containing monthly data spanning years and
         returns a dataset with one sample per year, for a specified three-month season.
 
-        Time stamps are centered on the season, e.g. seasons='DJF' returns January timestamps.
-
-        If a calculated season's timestamp falls outside the original range of monthly values, then the calculated mean
-        is dropped.  For example, if the monthly data's time range is [Jan-2000, Dec-2003] and the season is "DJF", the
-        seasonal mean computed from the single month of Dec-2003 is dropped.
+        See month_to_seasons() for details.
     """
-    startDate = xMon.time[0]
-    endDate = xMon.time[-1]
-    seasons_pd = {'DJF': ('QS-DEC', 1), 'JFM': ('QS-JAN', 2), 'FMA': ('QS-FEB', 3), 'MAM': ('QS-MAR', 4),
-                  'AMJ': ('QS-APR', 5), 'MJJ': ('QS-MAY', 6), 'JJA': ('QS-JUN', 7), 'JAS': ('QS-JUL', 8),
-                  'ASO': ('QS-AUG', 9), 'SON': ('QS-SEP', 10), 'OND': ('QS-OCT', 11), 'NDJ': ('QS-NOV', 12)}
-    try:
-        (season_pd, season_sel) = seasons_pd[season]
-    except KeyError:
-        raise ValueError("contributed: month_to_season: bad season: SEASON = " + season)
-
-    # Compute the three-month means, moving time labels ahead to the middle month.
-    month_offset = 'MS'
-    xSeasons = xMon.resample(time=season_pd, loffset=month_offset).mean()
-
-    # Filter just the desired season, and trim to the desired time range.
-    xSea = xSeasons.sel(time=xSeasons.time.dt.month == season_sel)
-    xSea = xSea.sel(time=slice(startDate, endDate))
-    return xSea
+    return month_to_seasons(xMon, [season])[season]
 
 
 ###############################################################################
-# Compute desired global seasonal mean using month_to_season()
+# Compute desired seasonal mean using month_to_season()
 
 # Choose the winter season (December-January-February)
 season = "DJF"
@@ -150,12 +190,6 @@ SLP = month_to_season(ds, season)
 print_debug('\n\nSLP:\n\n')
 print_debug(SLP)
 
-# Diagnostic plot: show slice of SLP
-sliceSLP = SLP.sel(lat=slice(latS, latN), lon=slice(lonL, lonR))
-
-print_debug('\n\nsliceSLP:\n')
-print_debug(sliceSLP)
-
 ###############################################################################
 # Create weights: sqrt(cos(lat))   [or sqrt(gw) ]
 
@@ -171,43 +205,141 @@ print_debug(clat)
 # Xarray will apply latitude-based weights to all longitudes and timesteps automatically.
 # This is called "broadcasting".
 
-wSLP = SLP
-wSLP['slp'] = clat * SLP['slp']
+xw = SLP.copy()
+xw['slp'] = clat * SLP['slp']
 
 # For now, metadata for slp must be copied over explicitly; it is not preserved by binary operators like multiplication.
-wSLP['slp'].attrs = ds['slp'].attrs
-wSLP['slp'].attrs['long_name'] = 'Wgt: ' + wSLP['slp'].attrs['long_name']
+xw['slp'].attrs = dict(ds['slp'].attrs)
+xw['slp'].attrs['long_name'] = 'Wgt: ' + xw['slp'].attrs['long_name']
+
+print_debug('\n\nxw:\n\n')
+print_debug(xw.slp)
 
 ###############################################################################
-# Subset data to the North Atlantic region:
+# Utility function:
 
-xw = wSLP.sel(lat=slice(latS, latN), lon=slice(lonL, lonR))
+# Define a utility function for computing the leading EOFs with a randomized, truncated SVD
+def eofunc_randomized(data, neof, time_chunk=120, oversamples=10, n_iter=4, seed=0):
+    """ This function computes the leading ``neof`` EOFs of ``data`` (dimensions "time" plus any spatial
+        dimensions) and their principal component time series, without decomposing the full space-time matrix.
+
+        The time-mean-removed data matrix is only ever read in blocks of ``time_chunk`` time steps, so ``data``
+        may be lazily loaded.  Apart from one block, memory use is proportional to space x (neof + oversamples).
+        ``n_iter`` power iterations (one extra pass over the data each) make the leading modes accurate even
+        when the eigenvalues are close together.
+
+        Returns (eof, eof_ts) with the same layout as geocat.comp's eofunc and eofunc_ts: ``eof`` has
+        dimensions ("evn", <spatial dims>), unit-length patterns, and "eigenvalues" and "pcvar" (percent of
+        the total variance) attributes; ``eof_ts`` has dimensions ("neval", "time") and holds the projections
+        of the anomalies onto each EOF, with the projection of the time mean in its "ts_mean" attribute.
+    """
+    x = data.transpose("time", ...)
+    space_dims = x.dims[1:]
+    space_shape = x.shape[1:]
+    ntime = x.sizes["time"]
+    nspace = int(np.prod(space_shape))
+    rank = min(neof + oversamples, ntime, nspace)
+
+    def blocks():
+        for start in range(0, ntime, time_chunk):
+            stop = min(start + time_chunk, ntime)
+            block = np.asarray(x.isel(time=slice(start, stop)).values, dtype=np.float64)
+            yield start, stop, block.reshape(stop - start, nspace)
+
+    # Pass 1: time mean at every grid point
+    mean = np.zeros(nspace)
+    for start, stop, block in blocks():
+        mean += block.sum(axis=0)
+    mean /= ntime
+
+    # X^T @ omega and X @ q for the anomaly matrix X, one block of time steps at a time
+    def transpose_product(omega):
+        y = np.zeros((nspace, omega.shape[1]))
+        for start, stop, block in blocks():
+            y += (block - mean).T @ omega[start:stop]
+        return y
+
+    def product(q):
+        z = np.empty((ntime, q.shape[1]))
+        for start, stop, block in blocks():
+            z[start:stop] = (block - mean) @ q
+        return z
+
+    # Randomized range finder for the spatial patterns, refined by power iterations
+    rng = np.random.default_rng(seed)
+    q, _ = np.linalg.qr(transpose_product(rng.standard_normal((ntime, rank))))
+    for _ in range(n_iter):
+        z, _ = np.linalg.qr(product(q))
+        q, _ = np.linalg.qr(transpose_product(z))
+
+    # Small SVD of the data projected onto that range
+    projected = product(q)
+    u, sigma, wt = np.linalg.svd(projected, full_matrices=False)
+    patterns = q @ wt[:neof].T
+    pcs = projected @ wt[:neof].T
+
+    # Total variance, for the percentage of variance explained by each EOF
+    total_variance = 0.
+    for start, stop, block in blocks():
+        total_variance += ((block - mean) ** 2).sum()
+    total_variance /= ntime - 1
+    eigenvalues = sigma[:neof] ** 2 / (ntime - 1)
+
+    space_coords = {dim: x[dim] for dim in space_dims if dim in x.coords}
+    eof = xr.DataArray(patterns.T.reshape((neof,) + space_shape),
+                       dims=("evn",) + space_dims,
+                       coords=dict(space_coords, evn=np.arange(neof)),
+                       attrs={"eigenvalues": eigenvalues,
+                              "pcvar": 100. * eigenvalues / total_variance,
+                              "method": "randomized truncated SVD"})
+    eof_ts = xr.DataArray(pcs.T, dims=("neval", "time"),
+                          coords={"neval": np.arange(neof), "time": x["time"]},
+                          attrs={"ts_mean": mean @ patterns})
+    return eof, eof_ts
 
-print_debug('\n\nxw:\n\n')
-print_debug(xw.slp)
 
 ###############################################################################
 # Compute the EOFs:
 
-eof = eofunc(xw["slp"], neof, time_dim=1, meta=True)
+if eof_solver == 'randomized':
+    eof, eof_ts = eofunc_randomized(xw["slp"], neof)
+else:
+    eof = eofunc(xw["slp"], neof, time_dim=1, meta=True)
+    eof_ts = eofunc_ts(xw["slp"], eof, time_dim=1, meta=True)
 
 print_debug('\n\neof:\n\n')
 print_debug(eof)
 
-eof_ts = eofunc_ts(xw["slp"], eof, time_dim=1, meta=True)
-
 print_debug('\n\neof_ts:\n\n')
 print_debug(eof_ts)
 
+###############################################################################
+# Compare the EOF solvers:
+
+# When debugging, time both solvers and report how much their results differ.
+# EOFs are only defined up to their sign, so the patterns are aligned first.
+if debug:
+    t0 = time.perf_counter()
+    full_eof = eofunc(xw["slp"], neof, time_dim=1, meta=True)
+    full_eof_ts = eofunc_ts(xw["slp"], full_eof, time_dim=1, meta=True)
+    t1 = time.perf_counter()
+    rand_eof, rand_eof_ts = eofunc_randomized(xw["slp"], neof)
+    t2 = time.perf_counter()
+
+    print_debug(f'\n\nEOF solvers: full {t1 - t0:.3f}s, randomized {t2 - t1:.3f}s')
+    for i in range(neof):
+        full_pattern = full_eof.sel(evn=i).values
+        rand_pattern = rand_eof.sel(evn=i).values
+        sign = np.sign(np.nansum(full_pattern * rand_pattern))
+        print_debug(f'EOF {i + 1}: pcvar {float(full_eof.pcvar[i]):.2f}% vs {float(rand_eof.pcvar[i]):.2f}%, '
+                    f'max pattern difference {np.nanmax(np.abs(full_pattern - sign * rand_pattern)):.2e}')
+
 ###############################################################################
 # Normalize time series:
 
 # Sum spatial weights over the area used.
 nLon = xw.sizes["lon"]
-
-# Bump the upper value of the slice, so that latitude values equal to latN are included.
-clat_subset = clat.sel(lat=slice(latS, latN+0.01))
-weightTotal = clat_subset.sum() * nLon
+weightTotal = clat.sum() * nLon
 eof_ts = eof_ts / weightTotal
 
 print_debug('\n\neof_ts normalized:\n\n')
@@ -230,8 +362,9 @@ def make_contour_plot(ax, dataset):
     v = np.linspace(-0.08, 0.08, 9, endpoint=True)
 
     # The function contourf() produces fill colors, and contour() calculates contour label locations.
+    # Passing the filled contours to contour() reuses their contour generator and levels.
     cplot = ax.contourf(lon, lat, values, levels=v, cmap=cmap, extend="both", transform=ccrs.PlateCarree())
-    p = ax.contour(lon, lat, values, levels=v, linewidths=0.0, transform=ccrs.PlateCarree())
+    p = ax.contour(cplot, linewidths=0.0, transform=ccrs.PlateCarree())
 
     # Label the contours
     ax.clabel(p, fontsize=8, fmt="%0.2f", colors="k")
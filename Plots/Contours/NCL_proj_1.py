@@ -51,12 +51,11 @@ gl = ax.gridlines(crs=ccrs.PlateCarree(), linewidth=1, color='k', alpha=0.5)
 newcmp = gvcmaps.gui_default
 
 # Contourf-plot data (for filled contours)
-wrap_t.plot.contourf(ax=ax, transform=ccrs.PlateCarree(), 
+filled = wrap_t.plot.contourf(ax=ax, transform=ccrs.PlateCarree(), 
                     levels = 11, cmap = newcmp,
                     cbar_kwargs={"orientation":"horizontal", "ticks":np.linspace(220, 300, 9), "label":'', "shrink":0.9})
-# Contour-plot data (for borderlines)
-wrap_t.plot.contour(ax=ax, transform=ccrs.PlateCarree(), 
-                    levels = 11, linewidths=0.5, cmap='k')
+# Contour-plot data (for borderlines), reusing the contour generator and levels of the filled contours
+ax.contour(filled, transform=ccrs.PlateCarree(), linewidths=0.5, colors='k')
 
 # Use geocat.viz.util convenience function to add titles to left and right of the plot axis.
 gvutil.set_titles_and_labels(ax, maintitle="Example of Mollweide Projection",
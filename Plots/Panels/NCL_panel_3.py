@@ -59,14 +59,15 @@ def plot_labelled_filled_contours(data, ax=None):
     )
 
     # matplotlib's contourf doesn't let you specify the "edgecolors" (MATLAB terminology)
-    # instead we plot black contours on top of the filled contours
-    handles["contour"] = data.plot.contour(
-        ax=ax,
-        levels=levels,
+    # instead we plot black contours on top of the filled contours.
+    # Passing the filled contours to contour() reuses their contour generator
+    # and levels instead of contouring the data a second time.
+    handles["contour"] = ax.contour(
+        handles["filled"],
         colors="k",  # note plurals in this and following kwargs
         linestyles="-",
         linewidths=0.5,
-        add_labels=False,  # again turn off automatic labels
+        transform=projection,
     )
 
     # Label the contours
@@ -23,7 +23,6 @@ import numpy as np
 from geocat.viz import cmaps as gvcmaps
 import geocat.viz.util as gvutil
 
-import math
 ################################################################
 # Definition of generate_2d_array and helper functions from https://github.com/NCAR/pyngl/blob/develop/src/ngl/__init__.py
 
@@ -84,13 +83,60 @@ highs_at -- an optional argument that is a list of coordinate
             the coordinates must be in the ranges specified in dims.
   """  
 
-#  Globals for random numbers.
+#  Check arguments.
 
-  global dfran_iseq
-  dfran_iseq = seed
+  checked = _check_2d_array_args(dims, num_low, num_high, lows_at, highs_at)
+  if checked is None:
+    return None
+  num_low, num_high = checked
+  _check_2d_array_seed(seed)
+
+#  Dims are reversed in order to get the same results as the NCL function.
+
+  nx = int(dims[1])
+  ny = int(dims[0])
+  centers = _2d_array_centers(nx, ny, num_low, num_high, seed, lows_at, highs_at)
+  return _scale_2d_array(_sum_of_exponentials(nx, ny, centers[np.newaxis])[0],
+                         minv, maxv)
+
+
+def generate_2d_arrays(dims, num_low, num_high, minv, maxv, seeds, \
+                       highs_at=None, lows_at=None):
+  """
+Generates one smooth 2D array per seed in a single call.
+arrays = generate_2d_arrays(dims, num_low, num_high, minv, maxv, seeds,
+                            highs_at=None, lows_at=None)
+Takes the same arguments as generate_2d_array, except that seeds is a
+list of seeds and minv, maxv may either be single values or lists with
+one value per seed. arrays[n] is identical to
+generate_2d_array(dims, num_low, num_high, minv[n], maxv[n], seeds[n]).
+  """
+  if len(seeds) == 0:
+    raise ValueError("generate_2d_arrays: seeds must contain at least one seed.")
+  checked = _check_2d_array_args(dims, num_low, num_high, lows_at, highs_at)
+  if checked is None:
+    return None
+  num_low, num_high = checked
+  for seed in seeds:
+    _check_2d_array_seed(seed)
+
+  nx = int(dims[1])
+  ny = int(dims[0])
+  nfields = len(seeds)
+  minv = np.broadcast_to(minv, nfields)
+  maxv = np.broadcast_to(maxv, nfields)
+  centers = np.stack([_2d_array_centers(nx, ny, num_low, num_high, seed,
+                                        lows_at, highs_at)
+                      for seed in seeds])
+  sums = _sum_of_exponentials(nx, ny, centers)
+  return np.stack([_scale_2d_array(sums[n], minv[n], maxv[n])
+                   for n in range(nfields)])
 
-#  Check arguments.
 
+#  Argument checks shared by generate_2d_array and generate_2d_arrays.
+#  Returns the adjusted (num_low, num_high), or None if dims is invalid.
+
+def _check_2d_array_args(dims, num_low, num_high, lows_at, highs_at):
   try:
     alen = len(dims)
   except:
@@ -114,30 +160,33 @@ highs_at -- an optional argument that is a list of coordinate
   if (num_high > 25):
     print("generate_2d_array: number of highs must be at most 25 - defaulting to 25.")
     num_high =25
-  if (seed > 100 or seed < 0):
-    print("generate_2d_array: seed must be in the interval [0,100] - seed set to 0.")
-    seed = 0
   if not lows_at is None:
     if (len(lows_at) != num_low):
       print("generate_2d_array: the list of positions for the lows must be the same size as num_low.")
   if not highs_at is None:
     if (len(highs_at) != num_high):
       print("generate_2d_array: the list of positions for the highs must be the same size as num_high.")
+  return num_low, num_high
 
 
-#  Dims are reversed in order to get the same results as the NCL function.
+#  Seed check, made for every seed of generate_2d_arrays.
+
+def _check_2d_array_seed(seed):
+  if (seed > 100 or seed < 0):
+    print("generate_2d_array: seed must be in the interval [0,100] - seed set to 0.")
+
+
+#  Locations and signs of the highs and lows of a generate_2d_array field.
+
+def _2d_array_centers(nx, ny, num_low, num_high, seed, lows_at, highs_at):
+  global dfran_iseq
+  dfran_iseq = seed
 
-  nx = int(dims[1])
-  ny = int(dims[0])
-  out_array = np.zeros([nx,ny],'f')
   tmp_array = np.zeros([3,51],'f')
-  fovm = 9./float(nx)
-  fovn = 9./float(ny)
   nlow = max(1,min(25,num_low))
   nhgh = max(1,min(25,num_high))
   ncnt = nlow + nhgh
 
-
   for k in range(num_low):
     if not lows_at is None:
       tmp_array[0,k] =  float(lows_at[k][1])   # lows at specified locations.
@@ -156,27 +205,44 @@ highs_at -- an optional argument that is a list of coordinate
       tmp_array[0,k] =  1.+(float(nx)-1.)*_dfran() # highs at random locations.
       tmp_array[1,k] =  1.+(float(ny)-1.)*_dfran() # highs at random locations.
       tmp_array[2,k] =  1.
-  
-  dmin =  1.e+36
-  dmax = -1.e+36
-  midpt = 0.5*(minv + maxv)
-  for j in range(ny):
-    for i in range(nx):
-      out_array[i,j] = midpt
-      for k in range(ncnt):
-        tempi = fovm*(float(i+1)-tmp_array[0,k])
-        tempj = fovn*(float(j+1)-tmp_array[1,k])
-        temp  = -(tempi*tempi + tempj*tempj)
-        if (temp >= -20.):
-          out_array[i,j] = out_array[i,j] +    \
-             0.5*(maxv - minv)*tmp_array[2,k]*math.exp(temp)
-      dmin = min(dmin,out_array[i,j])
-      dmax = max(dmax,out_array[i,j])
-                   
-  out_array = (((out_array-dmin)/(dmax-dmin))*(maxv-minv))+minv
 
-  del tmp_array
+  return tmp_array[:,:ncnt].astype(float)
+
+
+#  Sum of the signed exponential "bumps" centered at each high and low,
+#  for a stack of fields with shape (nfields, 3, ncnt). Bumps are cut off
+#  where the exponent drops below -20. The grid is processed in blocks of
+#  rows so that memory use stays bounded for large dimensions.
+
+def _sum_of_exponentials(nx, ny, centers, chunk_size=2**22):
+  fovm = 9./float(nx)
+  fovn = 9./float(ny)
+  ncnt = centers.shape[2]
+
+  tempi = fovm*(np.arange(1, nx+1)[np.newaxis,:,np.newaxis] - centers[:,np.newaxis,0,:])
+  tempj = fovn*(np.arange(1, ny+1)[np.newaxis,:,np.newaxis] - centers[:,np.newaxis,1,:])
+  tempi = tempi*tempi
+  tempj = tempj*tempj
+
+  out_array = np.empty([len(centers),nx,ny])
+  rows = max(1, chunk_size // (ny*ncnt))
+  for n in range(len(centers)):
+    for i in range(0, nx, rows):
+      temp = -(tempi[n,i:i+rows,np.newaxis,:] + tempj[n,np.newaxis,:,:])
+      bumps = np.exp(temp, where=(temp >= -20.), out=np.zeros_like(temp))
+      out_array[n,i:i+rows] = bumps @ centers[n,2]
+  return out_array
+
 
+#  Scale a sum of exponentials to the range [minv, maxv] and transpose it
+#  to (ny, nx).
+
+def _scale_2d_array(sums, minv, maxv):
+  midpt = 0.5*(minv + maxv)
+  out_array = (midpt + 0.5*(maxv - minv)*sums).astype('f')
+  dmin = out_array.min()
+  dmax = out_array.max()
+  out_array = (((out_array-dmin)/(dmax-dmin))*(maxv-minv))+minv
   return np.transpose(out_array,[1,0])
 
 
@@ -191,9 +257,8 @@ def _get_double_array(obj,name):
 # Create dummy data
 nx = 100
 ny = 100
-data1 = generate_2d_array((ny, nx), 10, 10, -19., 16., 0)
-data2 = generate_2d_array((ny, nx), 10, 10, -28., 15., 1)
-data3 = generate_2d_array((ny, nx), 10, 10, -25., 18., 2)
+data1, data2, data3 = generate_2d_arrays((ny, nx), 10, 10, [-19., -28., -25.],
+                                        [16., 15., 18.], seeds=[0, 1, 2])
 
 ###############################################################################
 # Create figure and axes using gvutil
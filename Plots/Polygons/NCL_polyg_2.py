@@ -22,16 +22,17 @@ See following URLs to see the reproduced NCL plot & script:
 ###############################################################################
 # Import packages:
 
+import numpy as np
 import xarray as xr
 import cartopy.crs as ccrs
 import matplotlib.pyplot as plt
 import matplotlib.colors as colors
 import matplotlib.cm as cm
+from matplotlib.collections import PolyCollection
 from geocat.viz import util as gvutil
 
 import geocat.datafiles as gdf
 import cartopy.io.shapereader as shpreader
-import shapely.geometry as sgeom
 from mpl_toolkits.axes_grid1.inset_locator import inset_axes
 
 ###############################################################################
@@ -50,20 +51,25 @@ colormap = colors.ListedColormap(['mediumpurple', 'mediumblue', 'royalblue', 'co
 colorbounds = [0, 5, 10, 15, 20, 25, 30, 35, 40, 50, 60, 70, 80, 90, 100]
 
 ###############################################################################
-# Define helper function to determine which color to fill the divisions based on precipitation data
-
-def findDivColor(colorbounds, pdata):
-
-    for x in range(len(colorbounds)):
-
-        if pdata >= colorbounds[len(colorbounds)-1]:
-            return colormap.colors[x-1]
-        if pdata >= colorbounds[x]:
-            continue
-        else:
-            # Index is 'x-1' because colorbounds is one item longer than colormap
-            return colormap.colors[x-1]
-
+# Compute the average annual precipitation of every climate division
+
+# The first variable in the dataset only has one attribute, 'current date';
+# every other variable is a climate division
+divisions = [varname for varname, da in ds.data_vars.items() if hasattr(da, 'state_name')]
+
+# Rather than looping through the whole array to find the sum of each 12 values (a year's worth of data),
+# adding each sum to an array, and then finding the average of the values in the array, as seen in the NCL
+# script, we sum the monthly values of all divisions at once and divide by the number of years
+# (the number of months recorded divided by 12 months per year)
+monthly = ds[divisions].to_dataarray(dim='division')
+numYears = monthly.shape[1] / 12
+precipitationdata = monthly.sum(dim=monthly.dims[1], skipna=False).values / numYears
+
+# Find the color of each climate division: np.digitize returns, for each value, the index of
+# the first bound above it, which is one past the index of its color (colorbounds is one item
+# longer than colormap).  Values at or above the last bound get the last color.
+color_index = np.clip(np.digitize(precipitationdata, colorbounds) - 1, 0, colormap.N - 1)
+division_colors = np.asarray(colormap.colors)[color_index]
 
 ###############################################################################
 # Create plot
@@ -86,40 +92,20 @@ states_shp = shpreader.natural_earth(resolution='110m', category='cultural', nam
 gvutil.set_titles_and_labels(ax, maintitle="Average Annual Precipiation \n Computed for the period 1899-1999 \n NCDC climate division data \n",
                              maintitlefontsize=18)
 
-# Add outlines of each state within the United States
-for state in shpreader.Reader(states_shp).geometries():
-
-    facecolor = 'white'
-    edgecolor = 'black'
-
-    ax.add_geometries([state], ccrs.PlateCarree(), facecolor=facecolor, edgecolor=edgecolor)
-
-# For each variable (climate division) in data set, create outline on map and fill with random color
-for varname, da in ds.data_vars.items():
-
-    # This condition is included because first item in xarray only has one attribute, 'current date'
-    if hasattr(da, 'state_name'):
-        # Get number of years of data by dividing number of months recorded (length of array) by 12 (12 months per year)
-        numYears = len(da.values)/12
-
-        # Get precipitation data for each climate division:
-        # Rather than looping through the whole array to find the sum of each 12 values (a year's worth of data),
-        # adding each sum to an array, and then finding the average of the values in the array, as seen in the NCL
-        # script, the one-line python method involves summing the dataset values and then dividing it by numYears (calculated in line 99)
-        precipitationdata = sum(da.values)/numYears
-
-        # Get borders of each climate division
-        lat = da.lat
-        lon = da.lon
-
-        # Get color of climate division
-        color = findDivColor(colorbounds, precipitationdata)
+# Add outlines of all states within the United States at once
+ax.add_geometries(shpreader.Reader(states_shp).geometries(), ccrs.PlateCarree(), facecolor='white', edgecolor='black')
 
-        # Use "shapely geometry" module to create division outlines from lat/lon coordinates
-        track = sgeom.LineString(zip(lon, lat))
+# Get the borders of all climate divisions, and project all of their vertices onto the map at once
+lons = [ds[varname].lon for varname in divisions]
+lats = [ds[varname].lat for varname in divisions]
+xyz = ax.projection.transform_points(ccrs.PlateCarree(), np.concatenate(lons), np.concatenate(lats))
+outlines = np.split(xyz[:, :2], np.cumsum([len(lon) for lon in lons])[:-1])
 
-        # Add division outlines to map
-        im = ax.add_geometries([track], ccrs.PlateCarree(), facecolor=color, edgecolor='k', linewidths=.5)
+# Add all division outlines to the map as a single collection, filled with their colors
+# (zorder=2 draws them above the states, which cartopy draws at zorder 1.5)
+divisions_collection = PolyCollection(outlines, facecolors=division_colors, edgecolors='k',
+                                      linewidths=.5, transform=ax.transData, zorder=2)
+ax.add_collection(divisions_collection)
 
 # Create and plot colorbar
 
@@ -4,7 +4,7 @@ NCL_scatter_4.py
 This script illustrates the following concepts:
    - Drawing a scatter plot with a regression line
    - Drawing a time series plot
-   - Calculating the least squared regression for a one dimensional array
+   - Calculating the least squared regression at every grid point at once
    - Smoothing data so that seasonal cycle is less prominent
    - Changing the markers in an XY plot
    - Changing the marker color in an XY plot
@@ -30,18 +30,80 @@ from geocat.viz import util as gvutil
 # Open a netCDF data file using xarray default engine and load the data into xarrays
 ds = xr.open_dataset(gdf.get("netcdf_files/b003_TS_200-299.nc"), decode_times=False)
 # Extract variable
-ts = ds.TS.sel(lat = 60, lon = 180, method = 'nearest')
+TS = ds.TS
+
+################################################################################
+# Define a utility function for computing rolling regressions at every grid point:
+
+
+def rolling_regression(da, window, dim='time'):
+    """Smooth ``da`` with a centered running mean of ``window`` steps along
+    ``dim`` and fit a least-squares line to the smoothed values, at every
+    point of the other dimensions at once.
+
+    The running means come from cumulative sums, and the slope and intercept
+    from the closed-form least-squares solution, so there are no loops over
+    grid points or time steps.  Missing values are skipped: a window holding
+    one is NaN, and each point's line is fitted to its complete windows only.
+
+    Returns a Dataset with the smoothed data ``rolled`` (NaN where the window
+    is incomplete, as ``rolling(..., center=True).mean()`` gives), the
+    ``slope`` and ``intercept`` maps, and the regression line ``regline``
+    evaluated at every time step of ``da``.
+    """
+    values = np.moveaxis(da.values.astype(np.float64), da.get_axis_num(dim), 0)
+    valid = ~np.isnan(values)
+    zeros = np.zeros((1,) + values.shape[1:])
+    csum = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0.), axis=0)])
+    count = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    with np.errstate(invalid='ignore'):
+        rolled = np.where(count[window:] - count[:-window] == window,
+                          (csum[window:] - csum[:-window]) / window, np.nan)
+
+    # Each window is labelled like xarray's rolling(center=True) labels it
+    start = window // 2
+    t = da[dim].values[start:start + len(rolled)].astype(np.float64)
+    t_offset = t.mean()
+    t_anom = t - t_offset
+
+    # Sums over the complete windows of each point
+    fitted = ~np.isnan(rolled)
+    y = np.where(fitted, rolled, 0.)
+    n = fitted.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t_mean = np.tensordot(t_anom, fitted, axes=(0, 0)) / n
+        y_mean = y.sum(axis=0) / n
+        slope = ((np.tensordot(t_anom, y, axes=(0, 0)) - n * t_mean * y_mean)
+                 / (np.tensordot(t_anom ** 2, fitted, axes=(0, 0)) - n * t_mean ** 2))
+    intercept = y_mean - slope * (t_mean + t_offset)
+
+    other_dims = [d for d in da.dims if d != dim]
+    other_coords = {d: da[d] for d in other_dims if d in da.coords}
+    all_t = da[dim].values.astype(np.float64)
+    regline = slope * all_t.reshape((-1,) + (1,) * slope.ndim) + intercept
+    padded = np.full(values.shape, np.nan)
+    padded[start:start + len(rolled)] = rolled
+    return xr.Dataset({
+        'rolled': ([dim] + other_dims, padded),
+        'slope': (other_dims, slope),
+        'intercept': (other_dims, intercept),
+        'regline': ([dim] + other_dims, regline),
+    }, coords=dict(other_coords, **{dim: da[dim]})).transpose(*da.dims, missing_dims='ignore')
+
 
 ################################################################################
 # Preprocess data:
 
 # Smooth data so that seasonal cycle is less prominent.
 # This is for demo purposes only  so that the regression line is more sloped.
-ts_rolled = ts.rolling(time=40, center=True).mean().dropna('time')
-
-# Calculate regression line
-m, b = np.polyfit(ts_rolled.time, ts_rolled.values, 1)
-regline_vals = [m * x + b for x in ts.time]
+# Then calculate the regression line.  Both are computed for every grid point
+# of the globe at once; we then plot the results for a single point.
+regression = rolling_regression(TS, window=40)
+point = regression.sel(lat=60, lon=180, method='nearest')
+
+ts = TS.sel(lat=60, lon=180, method='nearest')
+ts_rolled = point.rolled.dropna('time')
+regline_vals = point.regline
 
 ###############################################################################
 # Plot:
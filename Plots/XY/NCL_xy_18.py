@@ -19,6 +19,7 @@ See following URLs to see the reproduced NCL plot & script:
 ###############################################################################
 # Import packages:
 # ----------------
+import dask
 import numpy as np
 import xarray as xr
 from matplotlib import pyplot as plt
@@ -96,11 +97,10 @@ vds = xr.open_mfdataset(vfiles, concat_dim='case', combine='nested',
                         preprocess=assume_noleap_calendar, decode_times=False)
 
 # Read the "weights" file
-# (The xarray.Dataset.expand_dims call adds the longitude dimension to the
-# dataset, which originally depends only upon the latitude dimension. This
-# arguably makes computing the weighted means below more straight-forward.)
+# (The weights depend only upon the latitude dimension.  They are broadcast
+# against longitude on the fly when computing the weighted means below, so a
+# full latitude x longitude array of weights is never created.)
 gds = xr.open_dataset(gdf.get("netcdf_files/gw.nc"))
-gds = gds.expand_dims(dim={'lon': nds.lon})
 
 ###############################################################################
 # Observations:
@@ -122,29 +122,30 @@ obs = xr.DataArray(name='TREFHT', data=obs_data, coords=[('time', obs_time)])
 # ---------------------------------
 #
 # We define this function just for convenience.  This is equivalent to how
-# NCL computes the weighted mean.
+# NCL computes the weighted mean.  Xarray's ``weighted`` reductions contract
+# the data with the 1-D latitude weights directly (like ``numpy.einsum``),
+# which works chunk by chunk on the lazily loaded, multi-file data.
 
 def horizontal_weighted_mean(var, wgts):
-    return (var * wgts).sum(dim=['lat', 'lon']) / wgts.sum(dim=['lat', 'lon'])
+    return var.weighted(wgts).mean(dim=['lat', 'lon'])
 
 ###############################################################################
-# Natural data:
-# -------------
+# Natural and Natural + Anthropogenic data:
+# -----------------------------------------
 #
 # We compute the weighted mean across the latitude and longitude dimensions
 # (leaving only the ``case`` and ``time`` dimensions), and then we compute the
 # anomaly measured from the average of the first 30 years.
-
-gavn = horizontal_weighted_mean(nds["TREFHT"], gds["gw"])
-gavan = gavn - gavn.sel(time=slice('1890','1920')).mean(dim='time')
-
-###############################################################################
-# Natural + Anthropogenic data:
-# -----------------------------
 #
-# We do the same thing for the "natural + anthropogenic" data.
+# The data from ``open_mfdataset`` is read lazily with Dask, so nothing has
+# been read yet.  Passing both weighted means to ``dask.compute`` evaluates
+# them together: each of the eight files is read once and reduced to its
+# global mean in parallel, and only those small time series are combined.
+
+gavn, gavv = dask.compute(horizontal_weighted_mean(nds["TREFHT"], gds["gw"]),
+                          horizontal_weighted_mean(vds["TREFHT"], gds["gw"]))
 
-gavv = horizontal_weighted_mean(vds["TREFHT"], gds["gw"])
+gavan = gavn - gavn.sel(time=slice('1890','1920')).mean(dim='time')
 gavav = gavv - gavv.sel(time=slice('1890','1920')).mean(dim='time')
 
 ###############################################################################
@@ -155,21 +156,64 @@ gavav = gavv - gavv.sel(time=slice('1890','1920')).mean(dim='time')
 
 obs_avg = obs.sel(time=slice('1890','1999')) - obs.sel(time=slice('1890','1920')).mean(dim='time')
 
+###############################################################################
+# Ensemble Statistics Function:
+# -----------------------------
+#
+# This function computes the ensemble ``min``, ``max``, ``mean`` and
+# ``variance`` (and, optionally, quantiles) along a dimension in a single pass
+# over the ensemble members.  The mean and variance are accumulated with
+# Welford's algorithm, so each member is read only once, even if it is lazily
+# loaded, and missing values are skipped.  The statistics are returned
+# together as a single ``Dataset``.
+
+def ensemble_statistics(da, dim='case', quantiles=(), ddof=0):
+    template = da.isel({dim: 0}, drop=True)
+    count = np.zeros(template.shape)
+    mean = np.zeros(template.shape)
+    m2 = np.zeros(template.shape)
+    minimum = np.full(template.shape, np.inf)
+    maximum = np.full(template.shape, -np.inf)
+    members = []
+
+    for i in range(da.sizes[dim]):
+        x = np.asarray(da.isel({dim: i}).values, dtype=float)
+        valid = ~np.isnan(x)
+        count += valid
+        delta = np.where(valid, x - mean, 0.)
+        mean += delta / np.maximum(count, 1)
+        m2 += np.where(valid, delta * (x - mean), 0.)
+        minimum = np.fmin(minimum, x)
+        maximum = np.fmax(maximum, x)
+        if quantiles:
+            members.append(x)
+
+    empty = count == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = np.where(count > ddof, m2 / (count - ddof), np.nan)
+    stats = xr.Dataset({
+        'min': template.copy(data=np.where(empty, np.nan, minimum)),
+        'max': template.copy(data=np.where(empty, np.nan, maximum)),
+        'mean': template.copy(data=np.where(empty, np.nan, mean)),
+        'variance': template.copy(data=variance),
+    })
+    if quantiles:
+        stats['quantile'] = xr.DataArray(
+            np.nanquantile(np.stack(members), quantiles, axis=0),
+            dims=('quantile',) + template.dims,
+            coords=dict(template.coords, quantile=list(quantiles)))
+    return stats
+
 ###############################################################################
 # Calculate the ensemble Min. & Max. & Mean:
 # ------------------------------------------
 #
 # Here we find the ``min``, ``max``, and ``mean`` along the ``case`` (i.e.,
 # ensemble) dimension (leaving only the ``time`` dimension) for both of our
-# datasets.  We compute the equivalent anomaly for the observations data.
-
-gavan_min = gavan.min(dim='case')
-gavan_max = gavan.max(dim='case')
-gavan_avg = gavan.mean(dim='case')
+# datasets.
 
-gavav_min = gavav.min(dim='case')
-gavav_max = gavav.max(dim='case')
-gavav_avg = gavav.mean(dim='case')
+gavan_stats = ensemble_statistics(gavan, dim='case')
+gavav_stats = ensemble_statistics(gavav, dim='case')
 
 ###############################################################################
 # Plot:
@@ -186,8 +230,8 @@ time = gavan.time.dt.year
 
 # Plot data and add a legend
 ax.plot(time, obs_avg, color='black', label='Observations', zorder=4)
-ax.plot(time, gavan_avg, color='blue', label='Natural', zorder=3)
-ax.plot(time, gavav_avg, color='red', label='Anthropogenic + Natural', zorder=2)
+ax.plot(time, gavan_stats['mean'], color='blue', label='Natural', zorder=3)
+ax.plot(time, gavav_stats['mean'], color='red', label='Anthropogenic + Natural', zorder=2)
 ax.legend(loc='upper left', frameon=False, fontsize=18)
 
 # Use geocat.viz.util convenience function to add minor and major tick lines
@@ -202,8 +246,8 @@ ax.set_title('Parallel Climate Model Ensembles', fontsize=24, pad=60.0)
 ax.text(0.5, 1.125, 'Global Temperature Anomalies', fontsize=18, ha='center', va='center', transform=ax.transAxes)
 ax.text(0.5, 1.06, 'from 1890-1919 average', fontsize=14, ha='center', va='center', transform=ax.transAxes)
 ax.set_ylabel('$^\circ$C', fontsize=24)
-ax.fill_between(time, gavan_min, gavan_max, color='lightblue', zorder=0)
-ax.fill_between(time, gavav_min, gavav_max, color='lightpink', zorder=1)
+ax.fill_between(time, gavan_stats['min'], gavan_stats['max'], color='lightblue', zorder=0)
+ax.fill_between(time, gavav_stats['min'], gavav_stats['max'], color='lightpink', zorder=1)
 
 # Show the plot
 plt.tight_layout()
@@ -33,15 +33,12 @@ dsoik = ds.DSOI_KET
 dsoid = ds.DSOI_DEC
 date = ds.date
 
-# Creating a new array for x axis labels
-datedim = np.shape(date)[0]
-new_date = np.empty_like(date)
 # Dates in the file are represented by year and month
-# Create array that represents data by year and months as a fraction of a year
-for n in np.arange(0, datedim, 1):
-    yyyy = date[n]/100
-    mon = date[n]-yyyy*100
-    new_date[n] = yyyy + (mon-1)/12
+# Create array that represents data by year and months as a fraction of a year,
+# to use as the x axis
+new_date = (date // 100 + (date % 100 - 1) / 12).values
+dsoik = dsoik.assign_coords(time=new_date)
+dsoid = dsoid.assign_coords(time=new_date)
 
 ###############################################################################
 # Plot:
@@ -51,7 +48,7 @@ plt.figure(figsize=(8, 4))
 ax = plt.gca()
 
 # Plot reference line
-plt.plot([0, datedim], [0, 0], color='grey', linewidth=0.75)
+plt.plot([new_date[0], new_date[-1] + 1 / 12], [0, 0], color='grey', linewidth=0.75)
 
 # Plot data
 # _labels=False prevents axis labels from being drawn
@@ -59,8 +56,8 @@ dsoik.plot.line(ax=ax, color='black', linewidth=0.5, _labels=False)
 dsoid.plot.line(ax=ax, color='black', _labels=False)
 
 # Fill above and below the 0 line
-ax.fill_between(dsoik.time, dsoik, where=dsoik>0, color='red')
-ax.fill_between(dsoik.time, dsoik, where=dsoik<0, color='blue')
+ax.fill_between(new_date, dsoik, where=dsoik>0, color='red')
+ax.fill_between(new_date, dsoik, where=dsoik<0, color='blue')
 
 
 # Use geocat.viz.util convenience function to add minor and major tick lines
@@ -71,8 +68,8 @@ gvutil.add_major_minor_ticks(ax, x_minor_per_major=4, y_minor_per_major=5,
 gvutil.set_axes_limits_and_ticks(ax, ylim=(-3, 3), 
                                      yticks=np.linspace(-3, 3, 7),
                                      yticklabels=np.linspace(-3, 3, 7),
-                                     xlim=(0, datedim),
-                                     xticks=np.arange(0, datedim, 12*20),
+                                     xlim=(new_date[0], new_date[-1] + 1 / 12),
+                                     xticks=np.arange(1880, 1995, 20),
                                      xticklabels=np.arange(1880, 1995, 20))
 
 # Use geocat.viz.util convenience function to set titles and labels
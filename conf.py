@@ -12,9 +12,9 @@
 #
 import importlib
 import os
+import sys
 import warnings
-# import sys
-# sys.path.insert(0, os.path.abspath('.'))
+sys.path.insert(0, os.path.abspath('.'))
 
 
 # -- Project information -----------------------------------------------------
@@ -30,6 +30,7 @@ author = 'GeoCAT'
 # extensions coming with Sphinx (named 'sphinx.ext.*') or your custom
 # ones.
 extensions = [
+    'gallery_tools.incremental',
     'sphinx_gallery.gen_gallery',
 ]
 
@@ -75,6 +76,19 @@ html_static_path = ['_static']
 # Specify master_doc (see https://github.com/readthedocs/readthedocs.org/issues/2569#issuecomment-485117471)
 master_doc = 'index'
 
+# Number of worker processes used to execute the example scripts.  Set the
+# GEOCAT_EXAMPLES_JOBS environment variable to an integer, or to "auto" to use
+# every available core, e.g.:  GEOCAT_EXAMPLES_JOBS=auto make html
+# Each example then runs in its own worker process; sphinx-gallery collects the
+# images, captured output and notebooks in the usual ExampleTitleSortKey order.
+def _gallery_jobs(value):
+    value = value.strip().lower()
+    if value in ('', '0', '1', 'false', 'no'):
+        return False
+    if value in ('auto', 'true', 'yes'):
+        return True
+    return int(value)
+
 # Configure sphinx-gallery plugin
 from sphinx_gallery.sorting import ExampleTitleSortKey
 sphinx_gallery_conf = {
@@ -82,16 +96,35 @@ sphinx_gallery_conf = {
     'filename_pattern': '^((?!sgskip).)*$',
     'gallery_dirs': ['gallery'],  # path to where to save gallery generated output
     'within_subsection_order': ExampleTitleSortKey,
+    'parallel': _gallery_jobs(os.environ.get('GEOCAT_EXAMPLES_JOBS', '')),
 }
 
 html_theme_options = {
     'navigation_depth': 2,
 }
 
+# Resolve data files from a local store prefetched with
+# "python -m gallery_tools.datafiles fetch --store <dir>" when
+# GEOCAT_EXAMPLES_DATA_STORE=<dir> is set, so the build needs no network access.
+# This must come before anything imports geocat.datafiles, which downloads its
+# registry on import.
+from gallery_tools.datafiles import use_store_from_environment
+use_store_from_environment()
+sphinx_gallery_conf['reset_modules'] = ('matplotlib', 'seaborn', use_store_from_environment)
+
 # the following lines suppress INFO messages when files are downloaded using geocat.datafiles
 import geocat.datafiles
 import logging
 import pooch
 logger = pooch.get_logger()
 logger.setLevel(logging.WARNING)
+
 geocat.datafiles.get("registry.txt")
+
+# When the examples run sequentially in this process, share decoded datasets
+# between them: GEOCAT_EXAMPLES_DATASET_CACHE=<memory budget in MB>.  Set
+# GEOCAT_EXAMPLES_DATASET_CACHE_LOAD=1 to also keep whole files in memory.
+if os.environ.get('GEOCAT_EXAMPLES_DATASET_CACHE') and not sphinx_gallery_conf['parallel']:
+    from gallery_tools.datasets import install as install_dataset_cache
+    install_dataset_cache(int(os.environ['GEOCAT_EXAMPLES_DATASET_CACHE']) * 2**20,
+                          load=bool(os.environ.get('GEOCAT_EXAMPLES_DATASET_CACHE_LOAD')))
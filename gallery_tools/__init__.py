@@ -0,0 +1,23 @@
+"""
+Helpers for building, running and benchmarking the GeoCAT-examples gallery.
+
+Nothing in this package is needed to run an individual example script; the
+examples under ``Plots/`` stay self-contained.
+"""
+
+import os
+
+
+def cache_dir(*parts):
+    """Return (creating it if needed) a directory in the gallery tools cache.
+
+    The cache lives in ``$GEOCAT_EXAMPLES_CACHE`` if set, otherwise in
+    ``geocat-examples`` under the user cache directory.
+    """
+    root = os.environ.get('GEOCAT_EXAMPLES_CACHE')
+    if not root:
+        root = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join('~', '.cache')),
+                            'geocat-examples')
+    path = os.path.join(os.path.expanduser(root), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
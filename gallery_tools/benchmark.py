@@ -0,0 +1,205 @@
+"""
+Benchmark runner for the gallery examples.
+
+Every ``Plots/**/NCL_*.py`` script is executed headlessly in a fresh Python
+process (see :mod:`gallery_tools.execute`), recording its wall time, CPU time,
+peak RSS and the per-phase breakdown.  Each run is appended to an SQLite
+history database and can be compared against a stored JSON baseline::
+
+    python -m gallery_tools.benchmark --save-baseline baseline.json
+    python -m gallery_tools.benchmark --baseline baseline.json --threshold 0.2
+
+Pass ``--warm`` to run the examples in a :class:`~gallery_tools.pool.WarmPool`
+child instead, which leaves the shared imports out of the measurements.
+
+The command exits with status 1 if any example failed or regressed by more
+than ``--threshold`` (relative) and ``--min-delta`` (absolute seconds) in wall
+time or by more than ``--threshold`` in peak RSS.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+from .execute import PHASES
+from .manifest import example_scripts
+from .pool import WarmPool
+
+DEFAULT_HISTORY = os.path.join('_build', 'benchmarks', 'history.sqlite')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    revision TEXT,
+    example TEXT NOT NULL,
+    wall REAL,
+    cpu REAL,
+    peak_rss_mb REAL,
+    phases TEXT,
+    error TEXT
+)
+"""
+
+
+def run_in_subprocess(path, timeout=None):
+    """Run one example in a fresh interpreter and return its result dictionary."""
+    with tempfile.TemporaryDirectory() as tmp:
+        result_file = os.path.join(tmp, 'result.json')
+        cmd = [sys.executable, '-m', 'gallery_tools.execute', path,
+               '--result', result_file]
+        try:
+            proc = subprocess.run(cmd, stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.PIPE, timeout=timeout,
+                                  universal_newlines=True)
+        except subprocess.TimeoutExpired:
+            return {'example': path, 'error': 'timed out after {}s'.format(timeout)}
+        if not os.path.exists(result_file):
+            return {'example': path, 'error': proc.stderr or 'no result produced'}
+        with open(result_file) as f:
+            return json.load(f)
+
+
+def run_benchmarks(examples, repeat=1, timeout=None, runner=run_in_subprocess):
+    """Benchmark ``examples``, keeping the fastest of ``repeat`` runs of each."""
+    results = []
+    for path in examples:
+        best = None
+        for _ in range(repeat):
+            result = runner(path, timeout=timeout)
+            if result.get('error'):
+                best = result
+                break
+            if best is None or result['wall'] < best['wall']:
+                best = result
+        results.append(best)
+        print(format_result(best), file=sys.stderr)
+    return results
+
+
+def _error_summary(error):
+    """Return the last line of a traceback: the exception and its message."""
+    lines = [line for line in error.strip().splitlines() if line.strip()]
+    return lines[-1].strip() if lines else error
+
+
+def format_result(result):
+    if result.get('error'):
+        return '{:45s} FAILED {}'.format(result['example'], _error_summary(result['error']))
+    phases = ' '.join('{}={:.2f}'.format(name, result['phases'][name]['wall'])
+                      for name in PHASES)
+    return '{:45s} wall={:6.2f}s cpu={:6.2f}s rss={:7.1f}MiB  {}'.format(
+        result['example'], result['wall'], result['cpu'], result['peak_rss_mb'], phases)
+
+
+def _revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL,
+                                       universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_history(results, database=DEFAULT_HISTORY):
+    """Append a benchmark run to the SQLite history and return its run id."""
+    os.makedirs(os.path.dirname(database) or '.', exist_ok=True)
+    now = datetime.datetime.now()
+    timestamp = now.isoformat(timespec='seconds')
+    run_id = now.isoformat()
+    revision = _revision()
+    with sqlite3.connect(database) as conn:
+        conn.execute(_SCHEMA)
+        conn.executemany(
+            'INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(run_id, timestamp, revision, r['example'], r.get('wall'), r.get('cpu'),
+              r.get('peak_rss_mb'), json.dumps(r.get('phases')), r.get('error'))
+             for r in results])
+    return run_id
+
+
+def compare(results, baseline, threshold=0.2, min_delta=0.1):
+    """Return a list of ``(example, metric, baseline, current)`` regressions."""
+    reference = {r['example']: r for r in baseline if not r.get('error')}
+    regressions = []
+    for result in results:
+        old = reference.get(result['example'])
+        if old is None or result.get('error'):
+            continue
+        if (result['wall'] > old['wall'] * (1 + threshold)
+                and result['wall'] - old['wall'] > min_delta):
+            regressions.append((result['example'], 'wall', old['wall'], result['wall']))
+        if result['peak_rss_mb'] > old['peak_rss_mb'] * (1 + threshold):
+            regressions.append((result['example'], 'peak_rss_mb',
+                                old['peak_rss_mb'], result['peak_rss_mb']))
+    return regressions
+
+
+def _strip(result):
+    # Captured output is not needed in the history or baseline files
+    return {key: value for key, value in result.items() if key not in ('stdout', 'images')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the gallery example scripts.")
+    parser.add_argument('examples', nargs='*',
+                        help="example scripts to run (default: all of Plots/**/NCL_*.py)")
+    parser.add_argument('--repeat', type=int, default=1,
+                        help="run each example this many times and keep the fastest")
+    parser.add_argument('--timeout', type=float, default=None,
+                        help="abort an example after this many seconds")
+    parser.add_argument('--warm', action='store_true',
+                        help="run the examples in a preloaded warm worker pool")
+    parser.add_argument('--history', default=DEFAULT_HISTORY,
+                        help="SQLite database the run is appended to")
+    parser.add_argument('--json', help="also write the results of this run to a JSON file")
+    parser.add_argument('--baseline', help="JSON results to compare this run against")
+    parser.add_argument('--save-baseline', help="write the results of this run as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="relative slowdown that counts as a regression (default: 0.2)")
+    parser.add_argument('--min-delta', type=float, default=0.1,
+                        help="ignore wall time regressions smaller than this many seconds")
+    args = parser.parse_args(argv)
+
+    examples = args.examples or example_scripts()
+    if args.warm:
+        # One worker, so examples don't compete with each other for CPU time
+        with WarmPool(processes=1) as pool:
+            results = run_benchmarks(examples, repeat=args.repeat, timeout=args.timeout,
+                                     runner=lambda path, timeout: pool.run_one(path, timeout=timeout))
+    else:
+        results = run_benchmarks(examples, repeat=args.repeat, timeout=args.timeout)
+    results = [_strip(r) for r in results]
+
+    run_id = save_history(results, args.history)
+    print('Saved run {} to {}'.format(run_id, args.history), file=sys.stderr)
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    status = 0
+    for result in results:
+        if result.get('error'):
+            print('FAILED: {}\n{}'.format(result['example'], result['error'].rstrip()), file=sys.stderr)
+            status = 1
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        for example, metric, old, new in regressions:
+            print('REGRESSION: {} {} {:.2f} -> {:.2f} ({:+.0%})'.format(
+                example, metric, old, new, new / old - 1), file=sys.stderr)
+        if regressions:
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
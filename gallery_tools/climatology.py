@@ -0,0 +1,135 @@
+"""
+Out-of-core anomalies with a persisted climatology cache.
+
+``NCL_conLev_4`` subtracts the 100-year mean of ``b003_TS_200-299.nc`` from a
+single time step, recomputing that mean on every run.  :func:`climatology`
+computes a time mean by streaming blocks of time steps from disk, and stores
+it in the gallery tools cache keyed by (file content hash, variable, period).
+After the first call, :func:`anomaly` for any time step costs one slice read
+and one subtraction::
+
+    path = gdf.get("netcdf_files/b003_TS_200-299.nc")
+    newx = anomaly(path, "TS", time=0, decode_times=False)
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import xarray as xr
+
+from . import cache_dir
+from .datafiles import file_sha256
+
+
+def file_hash(path):
+    """Return the SHA-256 of a file's contents, memoized by path, size and mtime.
+
+    Hashing a large file reads all of it, so the digest is remembered in the
+    cache for as long as the file is not modified.
+    """
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    stamp = '{}:{}:{}'.format(path, stat.st_size, stat.st_mtime_ns)
+
+    index_path = os.path.join(cache_dir('climatologies'), 'file_hashes.json')
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+    if stamp not in index:
+        index[stamp] = file_sha256(path)
+        tmp = index_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp, index_path)
+    return index[stamp]
+
+
+def streaming_time_mean(da, time_chunk=12, dim='time'):
+    """Return the mean of ``da`` over ``dim``, reading ``time_chunk`` steps at a time.
+
+    Missing values are skipped.  Only one block of time steps is in memory
+    at once, in addition to the float64 running sum and count.
+    """
+    axis = da.get_axis_num(dim)
+    total = None
+    count = None
+    for start in range(0, da.sizes[dim], time_chunk):
+        block = np.asarray(da.isel({dim: slice(start, start + time_chunk)}).values, dtype=np.float64)
+        valid = ~np.isnan(block)
+        block_sum = np.where(valid, block, 0.).sum(axis=axis)
+        block_count = valid.sum(axis=axis)
+        if total is None:
+            total, count = block_sum, block_count
+        else:
+            total += block_sum
+            count += block_count
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(count > 0, total / count, np.nan)
+    template = da.isel({dim: 0}, drop=True)
+    return template.copy(data=mean.astype(da.dtype, copy=False))
+
+
+def _cache_path(path, variable, period):
+    key = hashlib.sha256(repr((file_hash(path), variable, period)).encode()).hexdigest()
+    return os.path.join(cache_dir('climatologies'), key + '.nc')
+
+
+def climatology(path, variable, period=None, time_chunk=12, **open_kwargs):
+    """Return the time mean of ``variable`` in the file at ``path``.
+
+    Parameters
+    ----------
+    path : str
+        netCDF file.
+    variable : str
+        Name of the variable to average.
+    period : tuple, optional
+        ``(start, stop)`` labels of the (inclusive) time range to average,
+        as for ``sel(time=slice(start, stop))``; the whole record by default.
+    time_chunk : int
+        Number of time steps read from disk at a time.
+    open_kwargs
+        Passed to ``xarray.open_dataset`` (e.g. ``decode_times=False``).
+
+    The result is cached on disk, keyed by the file's content hash, the
+    variable, the period and ``open_kwargs``.
+    """
+    if period is not None:
+        period = tuple(period)
+    cache_file = _cache_path(path, variable, (period, sorted(open_kwargs.items())))
+    if os.path.exists(cache_file):
+        with xr.open_dataset(cache_file) as cached:
+            return cached[variable].load()
+
+    with xr.open_dataset(path, **open_kwargs) as ds:
+        da = ds[variable]
+        if period is not None:
+            da = da.sel(time=slice(*period))
+        clim = streaming_time_mean(da, time_chunk=time_chunk)
+
+    tmp = cache_file + '.tmp'
+    clim.to_dataset(name=variable).to_netcdf(tmp)
+    os.replace(tmp, cache_file)
+    return clim
+
+
+def anomaly(path, variable, period=None, time_chunk=12, **selection_and_open_kwargs):
+    """Return a selection of ``variable`` minus its cached :func:`climatology`.
+
+    Keyword arguments naming dimensions of the variable (e.g. ``time=0``) select
+    the slice with ``isel``; all other keyword arguments are passed to
+    ``xarray.open_dataset``.  Only the selected slice is read from disk.
+    """
+    with xr.open_dataset(path, decode_cf=False) as raw:
+        dims = set(raw[variable].dims)
+    selection = {k: v for k, v in selection_and_open_kwargs.items() if k in dims}
+    open_kwargs = {k: v for k, v in selection_and_open_kwargs.items() if k not in dims}
+
+    clim = climatology(path, variable, period, time_chunk, **open_kwargs)
+    with xr.open_dataset(path, **open_kwargs) as ds:
+        values = ds[variable].isel(selection).load()
+    return values - clim
@@ -0,0 +1,179 @@
+"""
+Polygon coverage of latitude/longitude grid cells, cached per (grid, geometries).
+
+Regional masking in the examples either relies on a mask variable shipped
+with the data (``ORO`` in ``NCL_mask_1``) or hides everything outside the
+region by drawing over it (``NCL_overlay_11a``).  :func:`coverage` computes,
+for any rectilinear grid and any shapely geometries in longitude/latitude,
+
+``mask``
+    True for the cells whose centre lies in the region, and
+``fraction``
+    the fraction of each cell's area (in longitude/latitude degrees) covered
+    by the region.
+
+Only the cells that an STRtree finds intersecting the region are tested, and
+the exact (and costly) intersection is only computed for cells on the
+region's boundary.  Results are cached on disk, keyed by hashes of the grid
+and of the geometries' WKB, and in memory, so later calls are a lookup::
+
+    store = natural_earth_store('cultural', '110m', 'admin_0_countries')
+    china = store.geometries(store.where('ADMIN', ['China', 'Taiwan']))
+    mask, fraction = coverage(ds.lat, ds.lon, china)
+    t_china = regional_mean(ds.T, china)
+"""
+
+import collections
+import hashlib
+import os
+
+import numpy as np
+import shapely
+import xarray as xr
+
+from . import cache_dir
+
+# Results kept in memory, least recently used first
+MEMORY_ENTRIES = 32
+_memory = collections.OrderedDict()
+
+
+def cell_edges(centers, lower=None, upper=None):
+    """Return the ``len(centers) + 1`` cell edges halfway between ``centers``.
+
+    The outer edges are extrapolated by half a cell and, if given, clamped to
+    ``lower`` and ``upper`` (e.g. -90 and 90 for latitudes).
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    if len(centers) == 1:
+        edges = centers + np.array([-0.5, 0.5])
+    else:
+        mid = (centers[1:] + centers[:-1]) / 2
+        edges = np.concatenate([[2 * centers[0] - mid[0]], mid, [2 * centers[-1] - mid[-1]]])
+    if lower is not None or upper is not None:
+        edges = np.clip(edges, lower, upper)
+    return edges
+
+
+def _cache_key(lat, lon, geometries):
+    sha = hashlib.sha256()
+    sha.update(np.asarray(lat, dtype=np.float64).tobytes())
+    sha.update(b'|')
+    sha.update(np.asarray(lon, dtype=np.float64).tobytes())
+    for wkb in shapely.to_wkb(np.asarray(geometries, dtype=object)):
+        sha.update(hashlib.sha256(wkb).digest())
+    return sha.hexdigest()
+
+
+def _periodic_region(geometries):
+    """Return the union of ``geometries`` and its copies shifted by +-360 degrees.
+
+    This lets grids with longitudes in 0-360 and geometries in -180-180 (or
+    the other way around) be compared without converting either.
+    """
+    region = shapely.union_all(np.asarray(geometries, dtype=object))
+    copies = [shapely.transform(region, lambda xy, dx=dx: xy + [dx, 0.]) for dx in (-360., 360.)]
+    region = shapely.union_all([region] + copies)
+    shapely.prepare(region)
+    return region
+
+
+def _compute(lat, lon, geometries):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    lat_edges = cell_edges(lat, -90., 90.)
+    lon_edges = cell_edges(lon)
+    south, north = np.minimum(lat_edges[:-1], lat_edges[1:]), np.maximum(lat_edges[:-1], lat_edges[1:])
+    west, east = np.minimum(lon_edges[:-1], lon_edges[1:]), np.maximum(lon_edges[:-1], lon_edges[1:])
+
+    shape = (len(lat), len(lon))
+    mask = np.zeros(shape, bool)
+    fraction = np.zeros(shape)
+    region = _periodic_region(geometries)
+    if region.is_empty:
+        return mask, fraction
+
+    # Candidate cells: those whose box intersects the region
+    jj, ii = np.meshgrid(np.arange(len(lat)), np.arange(len(lon)), indexing='ij')
+    jj, ii = jj.ravel(), ii.ravel()
+    cells = shapely.box(west[ii], south[jj], east[ii], north[jj])
+    tree = shapely.STRtree(cells)
+    parts = shapely.get_parts(region)
+    candidates = np.unique(tree.query(parts, predicate='intersects')[1])
+    if not len(candidates):
+        return mask, fraction
+
+    cj, ci = jj[candidates], ii[candidates]
+    mask[cj, ci] = shapely.contains_xy(region, lon[ci], lat[cj])
+
+    # Cells inside the region are fully covered; only cells on its boundary
+    # need the intersection
+    inside = shapely.contains(region, cells[candidates])
+    fraction[cj[inside], ci[inside]] = 1.
+    edge = candidates[~inside]
+    if len(edge):
+        area = shapely.area(shapely.intersection(cells[edge], region))
+        fraction[jj[edge], ii[edge]] = np.clip(area / shapely.area(cells[edge]), 0., 1.)
+    return mask, fraction
+
+
+def coverage(lat, lon, geometries, cache=True):
+    """Return the membership ``mask`` and coverage ``fraction`` of a grid's cells.
+
+    Parameters
+    ----------
+    lat, lon : array-like
+        1-D cell centres of a rectilinear grid, in degrees.
+    geometries : sequence of shapely geometries
+        The region, in longitude/latitude degrees.
+    cache : bool
+        Read and write the result from/to the in-memory and on-disk caches.
+
+    Returns
+    -------
+    mask : ndarray of bool, shape ``(len(lat), len(lon))``
+        True where the cell centre lies in the region.
+    fraction : ndarray of float, shape ``(len(lat), len(lon))``
+        Fraction of the cell covered by the region, from 0 to 1.
+    """
+    geometries = list(geometries)
+    if not cache:
+        return _compute(lat, lon, geometries)
+
+    key = _cache_key(lat, lon, geometries)
+    if key in _memory:
+        _memory.move_to_end(key)
+        return _memory[key]
+    path = os.path.join(cache_dir('coverage'), key + '.npz')
+    if os.path.exists(path):
+        with np.load(path) as f:
+            result = f['mask'], f['fraction']
+    else:
+        result = _compute(lat, lon, geometries)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, mask=result[0], fraction=result[1])
+        os.replace(tmp, path)
+    for array in result:
+        array.setflags(write=False)
+    _memory[key] = result
+    while len(_memory) > MEMORY_ENTRIES:
+        _memory.popitem(last=False)
+    return result
+
+
+def coverage_weights(lat, lon, geometries, lat_dim='lat', lon_dim='lon', cache=True):
+    """Return area weights of a grid's cells within the region, as a ``DataArray``.
+
+    The weights are the covered fraction of each cell times the cosine of its
+    latitude, suitable for ``DataArray.weighted``.
+    """
+    _, fraction = coverage(lat, lon, geometries, cache=cache)
+    weights = fraction * np.cos(np.deg2rad(np.asarray(lat, dtype=np.float64)))[:, None]
+    return xr.DataArray(weights, dims=(lat_dim, lon_dim),
+                        coords={lat_dim: np.asarray(lat), lon_dim: np.asarray(lon)})
+
+
+def regional_mean(da, geometries, lat_dim='lat', lon_dim='lon', cache=True):
+    """Return the area-weighted mean of ``da`` over the region, for all other dimensions at once."""
+    weights = coverage_weights(da[lat_dim], da[lon_dim], geometries, lat_dim, lon_dim, cache)
+    return da.weighted(weights).mean(dim=[lat_dim, lon_dim])
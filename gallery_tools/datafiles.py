@@ -0,0 +1,381 @@
+"""
+Offline, content-addressed store for the gallery's ``geocat.datafiles`` inputs.
+
+The examples fetch their inputs lazily, one ``geocat.datafiles.get`` call at a
+time.  This module instead
+
+1. scans ``Plots/`` for every literal ``geocat.datafiles.get(...)`` argument and
+   writes them to a manifest (``manifest``),
+2. downloads and verifies all of them concurrently into a local
+   content-addressed store (``fetch``), and
+3. points ``geocat.datafiles`` at that store, so ``get`` resolves every file
+   locally (:func:`use_store`).
+
+Importing ``geocat.datafiles`` itself downloads its registry, so
+:func:`use_store` must run before anything imports it: it then installs a
+stand-in module, backed by the store, under that name.
+
+``serve`` exposes a store over HTTP on localhost, standing in for the remote
+data repository so tests and offline machines can populate a store without
+network access::
+
+    python -m gallery_tools.datafiles manifest
+    python -m gallery_tools.datafiles fetch --store ~/geocat-store
+    GEOCAT_EXAMPLES_DATA_STORE=~/geocat-store make html
+"""
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import hashlib
+import http.server
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import types
+import urllib.request
+
+from .manifest import scan_examples
+
+DATA_URL = 'https://github.com/NCAR/geocat-datafiles/raw/main/'
+DEFAULT_MANIFEST = 'datafiles_manifest.json'
+REGISTRY = 'registry.txt'
+STORE_VARIABLE = 'GEOCAT_EXAMPLES_DATA_STORE'
+
+
+def datafiles_pooch():
+    """Return the ``pooch.Pooch`` instance behind ``geocat.datafiles``."""
+    import geocat.datafiles
+    import pooch
+
+    for value in vars(geocat.datafiles).values():
+        if isinstance(value, pooch.Pooch):
+            return value
+    raise RuntimeError("geocat.datafiles does not expose a pooch registry")
+
+
+def file_sha256(path, blocksize=1 << 20):
+    """Return the hex SHA-256 digest of the file at ``path``."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _split_hash(known_hash):
+    """Split a pooch-style ``"alg:hexdigest"`` hash (``sha256`` by default)."""
+    if ':' in known_hash:
+        alg, digest = known_hash.split(':', 1)
+        return alg.lower(), digest.lower()
+    return 'sha256', known_hash.lower()
+
+
+def parse_registry(text):
+    """Parse the contents of a pooch ``registry.txt`` into ``{name: hash}``."""
+    registry = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split()
+        registry[fields[0]] = fields[1] if len(fields) > 1 else None
+    return registry
+
+
+###############################################################################
+# Manifest
+
+def write_manifest(path=DEFAULT_MANIFEST, examples_dir='Plots'):
+    """Write ``{data file: [examples using it]}`` for all examples to ``path``."""
+    manifest = {}
+    for example, names in scan_examples(examples_dir).items():
+        for name in names:
+            manifest.setdefault(name, []).append(example)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def read_manifest(path=DEFAULT_MANIFEST, examples_dir='Plots'):
+    """Return the sorted data file names listed in a manifest.
+
+    If the manifest does not exist, the examples are scanned instead.
+    """
+    if not os.path.exists(path):
+        return sorted({name for names in scan_examples(examples_dir).values() for name in names})
+    with open(path) as f:
+        return sorted(json.load(f))
+
+
+###############################################################################
+# Content-addressed store
+
+class ContentStore:
+    """Data files stored by content hash, with a by-name view for pooch.
+
+    File contents live once under ``<root>/objects/<alg>/<xx>/<digest>``, and
+    ``<root>/files/<name>`` links each data file name to its content, mirroring
+    the layout ``geocat.datafiles`` expects in its cache directory.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.files_dir = os.path.join(self.root, 'files')
+
+    def object_path(self, known_hash):
+        alg, digest = _split_hash(known_hash)
+        return os.path.join(self.root, 'objects', alg, digest[:2], digest[2:])
+
+    def file_path(self, name):
+        return os.path.join(self.files_dir, *name.split('/'))
+
+    def has(self, name, known_hash):
+        if known_hash is None:
+            return os.path.exists(self.file_path(name))
+        return (os.path.exists(self.object_path(known_hash))
+                and os.path.exists(self.file_path(name)))
+
+    def add(self, name, source, known_hash=None):
+        """Move the file ``source`` into the store as ``name``."""
+        target = self.file_path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if known_hash is None:
+            # Unversioned files (i.e. the registry itself) are not deduplicated
+            os.replace(source, target)
+            return target
+
+        obj = self.object_path(known_hash)
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        os.replace(source, obj)
+        if os.path.lexists(target):
+            os.remove(target)
+        try:
+            os.link(obj, target)
+        except OSError:
+            shutil.copyfile(obj, target)
+        return target
+
+
+###############################################################################
+# Concurrent fetching
+
+def _download(url, directory, known_hash):
+    """Download ``url`` into ``directory``, verifying it against ``known_hash``."""
+    alg, digest = _split_hash(known_hash) if known_hash else ('sha256', None)
+    hasher = hashlib.new(alg)
+    fd, tmp = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as out, urllib.request.urlopen(url) as response:
+            for block in iter(lambda: response.read(1 << 20), b''):
+                hasher.update(block)
+                out.write(block)
+        if digest is not None and hasher.hexdigest() != digest:
+            raise ValueError("{}: expected {} hash {}, got {}".format(
+                url, alg, digest, hasher.hexdigest()))
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return tmp
+
+
+async def _fetch_one(store, base_url, name, known_hash, semaphore, offline=False):
+    if store.has(name, known_hash):
+        return store.file_path(name)
+    if offline:
+        raise FileNotFoundError("{} is not in the store {}".format(name, store.root))
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        tmp = await loop.run_in_executor(
+            None, _download, base_url + name, store.root, known_hash)
+    return store.add(name, tmp, known_hash)
+
+
+async def _refresh_registry(store, base_url):
+    """Download ``registry.txt`` again, replacing the stored copy if it changed."""
+    loop = asyncio.get_running_loop()
+    tmp = await loop.run_in_executor(None, _download, base_url + REGISTRY, store.root, None)
+    path = store.file_path(REGISTRY)
+    if os.path.exists(path) and file_sha256(path) == file_sha256(tmp):
+        os.remove(tmp)
+        return path
+    return store.add(REGISTRY, tmp)
+
+
+async def fetch_all(names, store, base_url, registry=None, concurrency=8, offline=False):
+    """Fetch and verify ``names`` into ``store`` concurrently.
+
+    ``registry`` maps file names to their expected hashes; if it is omitted,
+    ``registry.txt`` is downloaded again from ``base_url`` first, so that
+    updated and new data files are picked up.  Files already in the store
+    with the expected hash are not downloaded again.  With ``offline=True``
+    nothing is downloaded: the stored registry is used and files missing from
+    the store raise ``FileNotFoundError``.  Returns ``{name: local path}``.
+    """
+    os.makedirs(store.root, exist_ok=True)
+    semaphore = asyncio.Semaphore(concurrency)
+    if registry is None:
+        if offline:
+            path = await _fetch_one(store, base_url, REGISTRY, None, semaphore, offline)
+        else:
+            path = await _refresh_registry(store, base_url)
+        with open(path) as f:
+            registry = parse_registry(f.read())
+
+    missing = [name for name in names if name not in registry and name != REGISTRY]
+    if missing:
+        raise KeyError("not in the data registry: {}".format(', '.join(missing)))
+
+    paths = await asyncio.gather(*[
+        _fetch_one(store, base_url, name, registry.get(name), semaphore, offline) for name in names])
+    return dict(zip(names, paths))
+
+
+def fetch(names, store_dir, base_url=None, registry=None, concurrency=8, offline=False):
+    """Synchronous wrapper around :func:`fetch_all`.
+
+    ``base_url`` defaults to the remote data repository used by ``geocat.datafiles``.
+    """
+    if base_url is None:
+        base_url = DATA_URL
+    store = ContentStore(store_dir)
+    return asyncio.run(fetch_all(list(names), store, base_url, registry, concurrency, offline))
+
+
+###############################################################################
+# Resolving geocat.datafiles from the store
+
+def _store_module(store_dir, base_url=None):
+    """Return a module standing in for ``geocat.datafiles``, backed by a store.
+
+    Its ``POOCH`` reads the registry from the store instead of downloading it.
+    """
+    import pooch
+
+    store = ContentStore(store_dir)
+    goodboy = pooch.create(path=store.files_dir, base_url=base_url or DATA_URL,
+                           registry={REGISTRY: None}, retry_if_failed=10)
+    if os.path.exists(store.file_path(REGISTRY)):
+        goodboy.load_registry(store.file_path(REGISTRY))
+    module = types.ModuleType('geocat.datafiles', "geocat.datafiles resolved from {}".format(store.root))
+    module.__version__ = '9999'
+    module.POOCH = goodboy
+    module.get = goodboy.fetch
+    return module
+
+
+def use_store(store_dir, base_url=None):
+    """Make ``geocat.datafiles.get`` resolve files from a prefetched store.
+
+    Files already in the store are returned without any network access (pooch
+    still verifies their hashes); ``base_url`` optionally redirects downloads
+    of anything missing, e.g. to a :func:`serve` stand-in.
+
+    If ``geocat.datafiles`` has not been imported yet, a stand-in module backed
+    by the store is installed in its place, so that importing it does not
+    download the registry.  Otherwise its pooch is redirected to the store.
+    """
+    if 'geocat.datafiles' in sys.modules:
+        goodboy = datafiles_pooch()
+        goodboy.path = ContentStore(store_dir).files_dir
+        if base_url is not None:
+            goodboy.base_url = base_url
+    else:
+        module = _store_module(store_dir, base_url)
+        try:
+            import geocat
+        except ImportError:
+            geocat = types.ModuleType('geocat')
+            geocat.__path__ = []
+            sys.modules['geocat'] = geocat
+        sys.modules['geocat.datafiles'] = module
+        geocat.datafiles = module
+    os.environ[STORE_VARIABLE] = store_dir
+
+
+def use_store_from_environment(*args):
+    """Apply :func:`use_store` if ``GEOCAT_EXAMPLES_DATA_STORE`` is set.
+
+    Accepts (and ignores) arguments so it can be used as a sphinx-gallery
+    ``reset_modules`` entry, which runs in every example's worker process.
+    """
+    store_dir = os.environ.get(STORE_VARIABLE)
+    if store_dir:
+        use_store(store_dir)
+
+
+###############################################################################
+# Local HTTP stand-in
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve(store_dir, host='127.0.0.1', port=0):
+    """Serve a store's files over HTTP in a background thread.
+
+    Yields the base URL (with trailing slash) to pass to :func:`fetch` or
+    :func:`use_store`.  ``port=0`` picks a free port.
+    """
+    handler = functools.partial(_QuietHandler, directory=ContentStore(store_dir).files_dir)
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield 'http://{}:{}/'.format(*server.server_address[:2])
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the offline gallery data store.")
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    manifest = commands.add_parser('manifest', help="scan Plots/ and write the data file manifest")
+    manifest.add_argument('--examples-dir', default='Plots')
+    manifest.add_argument('--output', default=DEFAULT_MANIFEST)
+
+    fetch_cmd = commands.add_parser('fetch', help="fetch every manifest entry into a store")
+    fetch_cmd.add_argument('--store', required=True, help="store directory")
+    fetch_cmd.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    fetch_cmd.add_argument('--base-url', help="download from this URL instead of the data repository")
+    fetch_cmd.add_argument('-j', '--jobs', type=int, default=8, help="concurrent downloads")
+    fetch_cmd.add_argument('--offline', action='store_true',
+                           help="only check the store against its stored registry; download nothing")
+
+    serve_cmd = commands.add_parser('serve', help="serve a store over HTTP")
+    serve_cmd.add_argument('--store', required=True, help="store directory")
+    serve_cmd.add_argument('--port', type=int, default=8000)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'manifest':
+        names = write_manifest(args.output, args.examples_dir)
+        print('Wrote {} data files to {}'.format(len(names), args.output))
+    elif args.command == 'fetch':
+        names = read_manifest(args.manifest) + [REGISTRY]
+        paths = fetch(names, args.store, base_url=args.base_url, concurrency=args.jobs,
+                      offline=args.offline)
+        print('{} data files available in {}'.format(len(paths), args.store))
+    elif args.command == 'serve':
+        with serve(args.store, port=args.port) as url:
+            print('Serving {} at {}'.format(args.store, url))
+            try:
+                threading.Event().wait()
+            except KeyboardInterrupt:
+                pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+Shared in-process cache of decoded ``xarray.Dataset`` objects.
+
+Many examples open the same files (``atmos.nc``, ``uv300.nc``,
+``b003_TS_200-299.nc``, ...).  When the examples run one after another in a
+single long-lived process, as in a sequential ``make html``, :func:`install`
+routes ``xarray.open_dataset`` through a :class:`DatasetCache` so each file is
+opened and decoded once.
+
+By default the cached datasets stay lazy: only their metadata and index
+coordinates are in memory, and each example reads just the variables and
+selections it uses, as it would without the cache.  With ``load=True`` whole
+files are loaded into memory on first use instead, which saves the reads as
+well, but also turns lazy subsetting (reading one region or a few
+longitudes of a large file) into a read of the whole file.
+
+Cached datasets are handed out as shallow copies: an example may add, drop or
+replace variables and attributes on its copy.  Lazy datasets are opened
+without xarray's in-memory caching, so data an example loads is its own;
+loaded datasets have read-only data arrays, so an in-place write to the
+shared data raises ``ValueError`` instead of corrupting it for the next
+example.
+"""
+
+import collections
+import os
+import threading
+
+import xarray as xr
+
+_open_dataset = xr.open_dataset
+
+
+def _freeze(value):
+    """Return a hashable version of an ``open_dataset`` keyword argument."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    hash(value)
+    return value
+
+
+def _shallow_copy(ds):
+    return ds.copy(deep=False)
+
+
+def _memory_bytes(ds):
+    """Return the size of the parts of ``ds`` held in memory: its index coordinates."""
+    return sum(ds[name].nbytes for name in ds.indexes)
+
+
+class DatasetCache:
+    """Least-recently-used cache of opened datasets, bounded by their size.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Memory budget for the cached data: the index coordinates of lazy
+        datasets, or ``Dataset.nbytes`` of loaded ones.  Least recently used
+        datasets are evicted once it is exceeded; a single dataset larger
+        than the budget is returned without being cached.
+    load : bool
+        Load each dataset into memory in full, instead of keeping it lazy.
+    """
+
+    def __init__(self, max_bytes=2**30, load=False):
+        self.max_bytes = max_bytes
+        self.load = load
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(path, **kwargs):
+        """Return the cache key for opening ``path`` with ``kwargs``.
+
+        The file's modification time and size are part of the key, so a
+        rewritten file is read again.  Raises ``TypeError`` if the arguments
+        cannot be hashed.
+        """
+        path = os.path.realpath(os.fspath(path))
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size, _freeze(kwargs))
+
+    def open_dataset(self, path, **kwargs):
+        """Return a shallow copy of ``xarray.open_dataset(path, **kwargs)``, opened once.
+
+        The dataset is loaded into memory first if the cache was created with
+        ``load=True``.
+        """
+        try:
+            key = self.key(path, **kwargs)
+        except TypeError:
+            return _open_dataset(path, **kwargs)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _shallow_copy(entry[0])
+            self.misses += 1
+
+        if self.load:
+            with _open_dataset(path, **kwargs) as source:
+                ds = source.load()
+            for variable in ds.variables.values():
+                data = variable.data
+                if hasattr(data, 'flags'):
+                    data.flags.writeable = False
+            nbytes = ds.nbytes
+        else:
+            # Without xarray's caching, values an example loads are not
+            # stored on the shared variables
+            ds = _open_dataset(path, **dict(kwargs, cache=kwargs.get('cache', False)))
+            nbytes = _memory_bytes(ds)
+
+        with self._lock:
+            if nbytes <= self.max_bytes and key not in self._entries:
+                self._entries[key] = ds, nbytes
+                self.nbytes += nbytes
+                self._evict()
+        return _shallow_copy(ds)
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+def install(max_bytes=2**30, load=False):
+    """Route ``xarray.open_dataset`` through a shared :class:`DatasetCache`.
+
+    Only calls on a file path without ``chunks`` are cached; everything else
+    (file objects, dask-backed datasets) goes straight to xarray.  Returns the
+    cache.
+    """
+    cache = DatasetCache(max_bytes, load)
+
+    def open_dataset(filename_or_obj, *args, **kwargs):
+        if args or kwargs.get('chunks') is not None \
+                or not isinstance(filename_or_obj, (str, os.PathLike)):
+            return _open_dataset(filename_or_obj, *args, **kwargs)
+        return cache.open_dataset(filename_or_obj, **kwargs)
+
+    open_dataset.__doc__ = _open_dataset.__doc__
+    xr.open_dataset = open_dataset
+    return cache
+
+
+def uninstall():
+    """Restore the original ``xarray.open_dataset``."""
+    xr.open_dataset = _open_dataset
@@ -0,0 +1,130 @@
+"""
+Label selection and conversions for integer ``yyyymm``/``yyyymmdd`` dates.
+
+Several data files store their dates as integers alongside a numeric
+``time`` dimension (``date`` in ``soi.nc`` and ``sst8292.nc``, for example).
+Selecting by such dates usually means swapping the ``time`` dimension for
+the ``date`` coordinate first, and converting them means arithmetic on the
+digits.  A :class:`DateIndex` is built once from the integer dates, after
+which selecting by date, by date range or converting the dates is
+vectorized and leaves the dataset's dimensions alone::
+
+    dates = DateIndex(ds.date)
+    sst = ds.SST.isel(time=dates.get_loc(198801))
+    winter = ds.SST.isel(time=dates.slice_indexer(198712, 198802))
+    years = dates.fractional_years()
+"""
+
+import cftime
+import numpy as np
+import pandas as pd
+
+# Days before the first of each month in a non-leap year
+_DAYS_BEFORE_MONTH = np.array([0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334])
+
+
+def _is_leap(year):
+    return (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+
+
+class DateIndex:
+    """Index of integer ``yyyymm`` or ``yyyymmdd`` dates along one dimension.
+
+    Parameters
+    ----------
+    dates : array-like
+        1-D integer dates; an ``xarray.DataArray`` also gives the dimension
+        name.  ``yyyymm`` is assumed if every date is below 1000000.
+    dim : str, optional
+        Name of the dimension indexed by ``dates``.
+    """
+
+    def __init__(self, dates, dim=None):
+        values = np.asarray(dates).astype(np.int64)
+        if values.ndim != 1:
+            raise ValueError('dates must be one-dimensional')
+        self.dim = dim if dim is not None else getattr(dates, 'dims', (None,))[0]
+        self.values = values
+        self.daily = bool(len(values)) and values.max() >= 1000000
+
+        # A hash table answers exact labels; the sorted order answers ranges
+        self._index = pd.Index(values)
+        self._order = np.argsort(values, kind='stable')
+        self._sorted = values[self._order]
+        self._monotonic = self._index.is_monotonic_increasing
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def year(self):
+        return self.values // (10000 if self.daily else 100)
+
+    @property
+    def month(self):
+        return (self.values // 100) % 100 if self.daily else self.values % 100
+
+    @property
+    def day(self):
+        return self.values % 100 if self.daily else np.ones(self.values.shape, np.int64)
+
+    def get_loc(self, date):
+        """Return the position of ``date``; raises ``KeyError`` if it is absent."""
+        loc = self._index.get_loc(int(date))
+        if not isinstance(loc, (int, np.integer)):
+            raise KeyError('date {} is not unique'.format(date))
+        return int(loc)
+
+    def get_indexer(self, dates):
+        """Return the positions of ``dates`` (-1 where a date is absent)."""
+        return self._index.get_indexer(np.asarray(dates).astype(np.int64).ravel())
+
+    def slice_indexer(self, start=None, stop=None):
+        """Return the positions of the dates from ``start`` to ``stop``, inclusive.
+
+        A ``slice`` is returned when the dates are in increasing order, so
+        that selecting with it is a view; otherwise an array of positions.
+        """
+        lo = 0 if start is None else np.searchsorted(self._sorted, start, side='left')
+        hi = len(self) if stop is None else np.searchsorted(self._sorted, stop, side='right')
+        if self._monotonic:
+            return slice(int(lo), int(hi))
+        return np.sort(self._order[lo:hi])
+
+    def sel(self, obj, date=None, start=None, stop=None):
+        """Select ``obj`` by one date, a list of dates, or a ``start``-``stop`` range."""
+        if date is None:
+            return obj.isel({self.dim: self.slice_indexer(start, stop)})
+        if np.ndim(date) == 0:
+            return obj.isel({self.dim: self.get_loc(date)})
+        indexer = self.get_indexer(date)
+        if (indexer < 0).any():
+            raise KeyError('dates {} not found'.format(np.asarray(date).ravel()[indexer < 0]))
+        return obj.isel({self.dim: indexer})
+
+    def fractional_years(self, offset=0.):
+        """Return the dates as fractional years.
+
+        As NCL's ``yyyymm_to_yyyyfrac`` and ``yyyymmdd_to_yyyyfrac``: month
+        dates give ``year + (month - 1 + offset) / 12``, daily dates
+        ``year + (day_of_year - 1 + offset) / days_in_year`` (Gregorian).
+        """
+        year, month = self.year, self.month
+        if not self.daily:
+            return year + (month - 1 + offset) / 12.
+        leap = _is_leap(year)
+        day_of_year = _DAYS_BEFORE_MONTH[month - 1] + self.day + (leap & (month > 2))
+        return year + (day_of_year - 1 + offset) / np.where(leap, 366., 365.)
+
+    def to_cftime(self, calendar='standard'):
+        """Return the dates as an array of ``cftime.datetime`` in ``calendar``.
+
+        Month dates fall on the first of the month.  Only the distinct
+        months are converted one at a time; the days are added in bulk.
+        """
+        units = 'days since 0001-01-01'
+        months, inverse = np.unique(self.year * 100 + self.month, return_inverse=True)
+        starts = cftime.date2num([cftime.datetime(m // 100, m % 100, 1, calendar=calendar)
+                                  for m in months], units, calendar=calendar)
+        days = np.asarray(starts)[inverse] + (self.day - 1)
+        return cftime.num2date(days, units, calendar=calendar)
@@ -0,0 +1,239 @@
+"""
+Headless execution of a single gallery example with a per-phase time breakdown.
+
+The example is run with the non-interactive Agg backend.  While it runs, the
+time spent in each phase below is accumulated (wall and CPU seconds):
+
+``imports``
+    top-level ``import`` statements
+``fetch``
+    ``geocat.datafiles.get``
+``open``
+    ``xarray.open_dataset`` / ``xarray.open_mfdataset``
+``artists``
+    figure, axes and plotting calls that create matplotlib artists
+``draw``
+    rendering and saving the figures (``savefig``, ``show`` and the final draw)
+``compute``
+    everything else
+
+Only the outermost instrumented call is counted, so e.g. the imports done
+inside ``xarray.open_dataset`` count towards ``open``.
+
+Run as ``python -m gallery_tools.execute Plots/XY/NCL_xy_3.py`` to execute one
+example and print its timings as JSON.
+"""
+
+import argparse
+import builtins
+import contextlib
+import functools
+import io
+import json
+import os
+import resource
+import runpy
+import sys
+import time
+import traceback
+
+from .datafiles import use_store_from_environment
+
+PHASES = ('imports', 'fetch', 'open', 'compute', 'artists', 'draw')
+
+# Module attributes that are timed as a given phase, patched as soon as the
+# module is imported by the example.
+_FUNCTIONS = {
+    'geocat.datafiles': [('get', 'fetch')],
+    'xarray': [('open_dataset', 'open'), ('open_mfdataset', 'open')],
+    'matplotlib.pyplot': [('show', 'draw'), ('savefig', 'draw'),
+                          ('figure', 'artists'), ('subplots', 'artists'),
+                          ('axes', 'artists'), ('subplot', 'artists'),
+                          ('colorbar', 'artists')],
+}
+
+# Public methods of these classes are timed as ``artists``, except for the
+# ones listed, which are timed as ``draw``.
+_CLASSES = {
+    'matplotlib.figure': ['Figure'],
+    'matplotlib.axes': ['Axes'],
+    'cartopy.mpl.geoaxes': ['GeoAxes'],
+}
+_DRAW_METHODS = {'savefig', 'draw', 'draw_artist'}
+_ARTIST_PREFIXES = ('add_', 'set_', 'plot', 'contour', 'quiver', 'stream',
+                    'pcolor', 'imshow', 'scatter', 'bar', 'fill', 'hist',
+                    'text', 'annotate', 'legend', 'colorbar', 'subplots',
+                    'suptitle', 'axhline', 'axvline', 'hlines', 'vlines',
+                    'errorbar', 'tick_params', 'clabel', 'coastlines',
+                    'gridlines', 'stock_img', 'barbs', 'tricontour')
+
+
+class PhaseTimer:
+    """Accumulates wall and CPU time spent in each of :data:`PHASES`."""
+
+    def __init__(self):
+        self.wall = dict.fromkeys(PHASES, 0.0)
+        self.cpu = dict.fromkeys(PHASES, 0.0)
+        self.active = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if self.active is not None:
+            # Nested call: the time is already counted by the outer phase
+            yield
+            return
+        self.active = name
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.wall[name] += time.perf_counter() - wall0
+            self.cpu[name] += time.process_time() - cpu0
+            self.active = None
+
+    def wrap(self, owner, attr, name):
+        """Replace ``owner.attr`` with a version timed as phase ``name``."""
+        original = getattr(owner, attr)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            with self.phase(name):
+                return original(*args, **kwargs)
+
+        setattr(owner, attr, timed)
+
+
+class _Instrumentation:
+    """Installs the phase timers into the interpreter while an example runs."""
+
+    def __init__(self, timer):
+        self.timer = timer
+        self.patched = set()
+        self._import = builtins.__import__
+
+    def _patch_loaded_modules(self):
+        for module_name, functions in _FUNCTIONS.items():
+            module = sys.modules.get(module_name)
+            if module is None or module_name in self.patched:
+                continue
+            self.patched.add(module_name)
+            for attr, phase in functions:
+                if hasattr(module, attr):
+                    self.timer.wrap(module, attr, phase)
+
+        for module_name, class_names in _CLASSES.items():
+            module = sys.modules.get(module_name)
+            if module is None or module_name in self.patched:
+                continue
+            self.patched.add(module_name)
+            for class_name in class_names:
+                cls = getattr(module, class_name)
+                for attr, value in list(vars(cls).items()):
+                    if not callable(value) or isinstance(value, (type, staticmethod, classmethod)):
+                        continue
+                    if attr in _DRAW_METHODS:
+                        self.timer.wrap(cls, attr, 'draw')
+                    elif attr.startswith(_ARTIST_PREFIXES):
+                        self.timer.wrap(cls, attr, 'artists')
+
+    def _timed_import(self, *args, **kwargs):
+        if self.timer.active is not None:
+            return self._import(*args, **kwargs)
+        with self.timer.phase('imports'):
+            module = self._import(*args, **kwargs)
+        self._patch_loaded_modules()
+        return module
+
+    def __enter__(self):
+        self._patch_loaded_modules()
+        builtins.__import__ = self._timed_import
+        return self
+
+    def __exit__(self, *exc):
+        builtins.__import__ = self._import
+
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB elsewhere
+    if sys.platform == 'darwin':
+        return peak / 2**20
+    return peak / 2**10
+
+
+def run_example(path, output_dir=None):
+    """Execute the example script at ``path`` and return its timings.
+
+    Figures left open by the script are drawn and, if ``output_dir`` is given,
+    saved there as PNG files.  The returned dictionary holds the total
+    ``wall``/``cpu`` seconds, ``peak_rss_mb``, the per-phase ``phases``
+    breakdown, the captured ``stdout``, the saved ``images`` and the
+    formatted traceback in ``error`` if the script raised.
+    """
+    os.environ['MPLBACKEND'] = 'Agg'
+    use_store_from_environment()
+    timer = PhaseTimer()
+    stdout = io.StringIO()
+    images = []
+    error = None
+
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    with _Instrumentation(timer), contextlib.redirect_stdout(stdout):
+        try:
+            runpy.run_path(path, run_name='__main__')
+
+            plt = sys.modules.get('matplotlib.pyplot')
+            if plt is not None:
+                with timer.phase('draw'):
+                    for num in plt.get_fignums():
+                        fig = plt.figure(num)
+                        if output_dir is None:
+                            fig.canvas.draw()
+                            continue
+                        os.makedirs(output_dir, exist_ok=True)
+                        name = os.path.splitext(os.path.basename(path))[0]
+                        image = os.path.join(output_dir, '{}_{:03d}.png'.format(name, num))
+                        fig.savefig(image)
+                        images.append(image)
+                plt.close('all')
+        except Exception:
+            error = traceback.format_exc()
+    wall = time.perf_counter() - wall0
+    cpu = time.process_time() - cpu0
+
+    timer.wall['compute'] = max(0.0, wall - sum(timer.wall.values()))
+    timer.cpu['compute'] = max(0.0, cpu - sum(timer.cpu.values()))
+
+    return {
+        'example': path,
+        'wall': wall,
+        'cpu': cpu,
+        'peak_rss_mb': peak_rss_mb(),
+        'phases': {name: {'wall': timer.wall[name], 'cpu': timer.cpu[name]}
+                   for name in PHASES},
+        'stdout': stdout.getvalue(),
+        'images': images,
+        'error': error,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('example', help="path of the example script to run")
+    parser.add_argument('--output-dir', help="directory to save the example's figures to")
+    parser.add_argument('--result', help="write the JSON result to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    result = run_example(args.example, output_dir=args.output_dir)
+    if args.result:
+        with open(args.result, 'w') as f:
+            json.dump(result, f)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    return 1 if result['error'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Extent-aware cache of clipped and simplified map overlay geometries.
+
+Examples such as ``NCL_overlay_11a``/``11b`` or ``NCL_polyg_4`` add global 10m
+geometries to a map that only shows a small window, so cartopy projects and
+draws every vertex of the world.  :func:`visible_geometries` instead
+
+1. selects the records of a :class:`~gallery_tools.shapestore.ShapeStore`
+   whose bounds touch the map extent (plus a margin),
+2. clips them to that window,
+3. projects them to the map projection, and
+4. simplifies them to a tolerance of a fraction of an output pixel,
+
+and caches the result on disk keyed by (source, records, extent, projection,
+dpi, axes width), so the cost depends on what is visible rather than on the
+size of the source dataset::
+
+    store = natural_earth_store('cultural', '10m', 'admin_0_countries')
+    geoms = visible_geometries(store, [100, 145, 15, 55], projection,
+                               dpi=fig.dpi, width=ax_width_inches)
+    ax.add_geometries(geoms, crs=projection, ...)
+"""
+
+import hashlib
+import os
+
+import numpy as np
+import shapely
+
+from . import cache_dir
+
+
+def _padded_extent(extent, margin):
+    x0, x1, y0, y1 = extent
+    dx = (x1 - x0) * margin
+    dy = (y1 - y0) * margin
+    return [x0 - dx, x1 + dx, max(y0 - dy, -90), min(y1 + dy, 90)]
+
+
+def pixel_size(extent, projection, dpi, width, source_crs=None):
+    """Return the size of one output pixel in ``projection`` units.
+
+    ``width`` is the width of the map axes in inches.
+    """
+    import cartopy.crs as ccrs
+
+    source_crs = source_crs or ccrs.PlateCarree()
+    x0, x1, y0, y1 = extent
+    window = shapely.box(x0, y0, x1, y1)
+    minx, _, maxx, _ = projection.project_geometry(window, source_crs).bounds
+    return (maxx - minx) / (width * dpi)
+
+
+def _cache_key(store, ids, extent, projection, dpi, width, margin, pixel_fraction):
+    sha = hashlib.sha256()
+    sha.update(os.path.realpath(store.store_dir).encode())
+    sha.update(b'all' if ids is None else np.asarray(ids, dtype=np.int64).tobytes())
+    sha.update(repr((list(map(float, extent)), projection.proj4_init, float(dpi),
+                     float(width), margin, pixel_fraction)).encode())
+    return sha.hexdigest()
+
+
+def _save(path, geometries):
+    data = [shapely.to_wkb(g) for g in geometries]
+    offsets = np.cumsum([0] + [len(d) for d in data])
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, wkb=np.frombuffer(b''.join(data), dtype=np.uint8), offsets=offsets)
+    os.replace(tmp, path)
+
+
+def _load(path):
+    with np.load(path) as f:
+        wkb = f['wkb'].tobytes()
+        offsets = f['offsets']
+    return list(shapely.from_wkb([wkb[offsets[i]:offsets[i + 1]]
+                                  for i in range(len(offsets) - 1)]))
+
+
+def visible_geometries(store, extent, projection, dpi, width, ids=None,
+                       margin=0.05, pixel_fraction=0.5, cache=True):
+    """Return the parts of a store's geometries visible in a map window.
+
+    Parameters
+    ----------
+    store : :class:`~gallery_tools.shapestore.ShapeStore`
+        Source geometries in longitude/latitude.
+    extent : list of float
+        Map extent ``[lon0, lon1, lat0, lat1]``, as passed to ``set_extent``.
+    projection : :class:`cartopy.crs.Projection`
+        Map projection; the returned geometries are in its coordinates.
+    dpi, width : float
+        Output resolution and width of the map axes in inches, which determine
+        the simplification tolerance.
+    ids : array-like of int, optional
+        Restrict the result to these records (e.g. from ``store.where``).
+    margin : float
+        Fraction of the extent added on every side before clipping, so lines
+        are not cut exactly at the map edge.
+    pixel_fraction : float
+        Simplification tolerance as a fraction of an output pixel.
+    cache : bool
+        Read and write the result from/to the on-disk cache.
+
+    Returns
+    -------
+    list of shapely geometries
+        Clipped, projected and simplified geometries, empty ones dropped.
+    """
+    import cartopy.crs as ccrs
+
+    path = None
+    if cache:
+        key = _cache_key(store, ids, extent, projection, dpi, width, margin, pixel_fraction)
+        path = os.path.join(cache_dir('geometries'), key + '.npz')
+        if os.path.exists(path):
+            return _load(path)
+
+    window_extent = _padded_extent(extent, margin)
+    candidates = store.query_bbox(window_extent)
+    if ids is not None:
+        candidates = np.intersect1d(candidates, ids)
+
+    x0, x1, y0, y1 = window_extent
+    clipped = shapely.clip_by_rect(store.geometries(candidates), x0, y0, x1, y1)
+
+    source_crs = ccrs.PlateCarree()
+    tolerance = pixel_fraction * pixel_size(extent, projection, dpi, width, source_crs)
+    geometries = []
+    for geometry in clipped:
+        if geometry is None or geometry.is_empty:
+            continue
+        projected = projection.project_geometry(geometry, source_crs)
+        simplified = shapely.simplify(projected, tolerance, preserve_topology=True)
+        if not simplified.is_empty:
+            geometries.append(simplified)
+
+    if path is not None:
+        _save(path, geometries)
+    return geometries
@@ -0,0 +1,176 @@
+"""
+Hovmöller (time-latitude and time-longitude) sections read straight from disk.
+
+``NCL_time_lat_2`` plots ``ds.TS[:, :, 29]``, a single longitude of a file
+that is small enough to read whole.  For multi-decade daily files the
+functions here read only the hyperslabs that a section needs, a block of
+time steps at a time, aligned to the variable's netCDF chunking.  Band
+averages are reduced block by block, so the full band is never in memory::
+
+    ds = xr.open_dataset(path, decode_times=False)
+    section = time_lat_section(ds.TS, lon=80)
+    band = lon_band_mean(ds.TS, 60, 100)
+    sections = time_lat_sections(ds.TS, [0, 90, 180, 270])
+
+The variable must be opened lazily (without ``chunks``), so that indexing it
+reads from the file instead of from memory.
+"""
+
+import numpy as np
+
+BLOCK_BYTES = 64 * 2**20
+
+# Largest gap between indices read together from unchunked storage
+UNCHUNKED_GAP = 4
+
+
+def storage_chunks(da):
+    """Return a dict of the on-disk chunk length of each dimension of ``da``.
+
+    Variables without netCDF-4 chunking (contiguous or netCDF-3 storage) are
+    reported as a single chunk per dimension.
+    """
+    chunks = da.encoding.get('chunksizes') or da.shape
+    return dict(zip(da.dims, chunks))
+
+
+def _runs(indices, max_gap):
+    """Split sorted unique ``indices`` into ``(start, stop)`` ranges.
+
+    Neighbouring indices less than ``max_gap`` apart share a range, since
+    reading the few values between them is cheaper than another read.
+    """
+    runs = []
+    start = prev = indices[0]
+    for i in indices[1:]:
+        if i - prev > max_gap:
+            runs.append((start, prev + 1))
+            start = i
+        prev = i
+    runs.append((start, prev + 1))
+    return runs
+
+
+def _band_indices(coord, lower, upper, periodic):
+    values = np.asarray(coord.values, dtype=np.float64)
+    if periodic:
+        if upper - lower >= 360:
+            mask = np.ones(values.shape, bool)
+        else:
+            mask = (values - lower) % 360 <= (upper - lower) % 360
+    else:
+        mask = (values >= lower) & (values <= upper)
+    indices = np.flatnonzero(mask)
+    if not len(indices):
+        raise ValueError('no {} values between {} and {}'.format(coord.name, lower, upper))
+    return indices
+
+
+def _read_along(da, dim, indices, reduce=None, time_dim='time', block_bytes=BLOCK_BYTES):
+    """Read ``da`` at positions ``indices`` of ``dim``, one block of time steps at a time.
+
+    Returns an array with the dimensions of ``da``, with ``dim`` replaced by
+    ``indices`` in the requested order.  ``reduce``, if given, is applied to
+    each block and must keep the number of dimensions (e.g. a mean with
+    ``keepdims=True``).
+    """
+    indices = np.asarray(indices)
+    wanted = np.unique(indices)
+    chunks = storage_chunks(da)
+    # In a chunked file, indices in the same chunk cost one chunk read anyway;
+    # unchunked storage only has to read the values asked for
+    max_gap = max(chunks[dim], 1) if da.encoding.get('chunksizes') else UNCHUNKED_GAP
+    runs = _runs(wanted, max_gap=max_gap)
+    axis = da.get_axis_num(dim)
+    time_axis = da.get_axis_num(time_dim)
+
+    # Size the time blocks to ``block_bytes``, in whole storage chunks
+    columns = sum(stop - start for start, stop in runs)
+    step_bytes = da.dtype.itemsize * columns * np.prod(
+        [n for d, n in da.sizes.items() if d not in (dim, time_dim)])
+    time_chunk = chunks[time_dim] if chunks[time_dim] < da.sizes[time_dim] else 1
+    time_step = max(int(block_bytes // max(step_bytes * time_chunk, 1)), 1) * time_chunk
+
+    order = np.searchsorted(wanted, indices)
+    blocks = []
+    for t0 in range(0, da.sizes[time_dim], time_step):
+        parts = []
+        for start, stop in runs:
+            part = da.isel({time_dim: slice(t0, t0 + time_step), dim: slice(start, stop)}).values
+            keep = wanted[(wanted >= start) & (wanted < stop)] - start
+            parts.append(np.take(part, keep, axis=axis))
+        block = np.take(np.concatenate(parts, axis=axis), order, axis=axis)
+        blocks.append(block if reduce is None else reduce(block))
+    return np.concatenate(blocks, axis=time_axis)
+
+
+def _nanmean(weights=None):
+    """Return a block reducer for the mean over one axis, skipping missing values."""
+    def reduce(block, axis):
+        valid = ~np.isnan(block)
+        w = valid if weights is None else valid * weights
+        total = np.where(valid, block, 0.) * w
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return total.sum(axis=axis, keepdims=True) / w.sum(axis=axis, keepdims=True)
+    return reduce
+
+
+def time_lat_sections(da, lons, method='nearest', lon_dim='lon', time_dim='time',
+                      block_bytes=BLOCK_BYTES):
+    """Return the time-latitude sections of ``da`` at each longitude in ``lons``.
+
+    All of the sections are read together: longitudes in the same storage
+    chunk (or close together, for unchunked files) come from one read per
+    block of time steps.  The result keeps the dimensions of ``da``, with
+    ``lon_dim`` holding the longitudes nearest to ``lons``.
+    """
+    indices = da.indexes[lon_dim].get_indexer(np.atleast_1d(lons), method=method)
+    if (indices < 0).any():
+        raise KeyError('longitudes {} not found'.format(np.atleast_1d(lons)[indices < 0]))
+    values = _read_along(da, lon_dim, indices, time_dim=time_dim, block_bytes=block_bytes)
+    return da.isel({lon_dim: indices}).copy(data=values)
+
+
+def time_lat_section(da, lon, method='nearest', lon_dim='lon', time_dim='time',
+                     block_bytes=BLOCK_BYTES):
+    """Return the time-latitude section of ``da`` at the longitude nearest to ``lon``."""
+    return time_lat_sections(da, [lon], method, lon_dim, time_dim, block_bytes).isel({lon_dim: 0})
+
+
+def lon_band_mean(da, lon_min, lon_max, lon_dim='lon', time_dim='time',
+                  block_bytes=BLOCK_BYTES):
+    """Return the time-latitude section of ``da`` averaged from ``lon_min`` to ``lon_max``.
+
+    The band may cross the longitude seam (e.g. ``lon_min=350, lon_max=10``).
+    Missing values are skipped.
+    """
+    indices = _band_indices(da[lon_dim], lon_min, lon_max, periodic=True)
+    axis = da.get_axis_num(lon_dim)
+    reduce = _nanmean()
+    values = _read_along(da, lon_dim, indices, lambda block: reduce(block, axis),
+                         time_dim=time_dim, block_bytes=block_bytes)
+    result = da.isel({lon_dim: 0}, drop=True).copy(data=values.squeeze(axis))
+    result.attrs['lon_band'] = (lon_min, lon_max)
+    return result
+
+
+def lat_band_mean(da, lat_min, lat_max, weighted=True, lat_dim='lat', time_dim='time',
+                  block_bytes=BLOCK_BYTES):
+    """Return the time-longitude section of ``da`` averaged from ``lat_min`` to ``lat_max``.
+
+    The average is weighted by the cosine of latitude unless ``weighted`` is
+    False.  Missing values are skipped.
+    """
+    indices = _band_indices(da[lat_dim], lat_min, lat_max, periodic=False)
+    axis = da.get_axis_num(lat_dim)
+    weights = None
+    if weighted:
+        shape = [1] * da.ndim
+        shape[axis] = len(indices)
+        weights = np.cos(np.deg2rad(da[lat_dim].values[indices])).reshape(shape)
+    reduce = _nanmean(weights)
+    values = _read_along(da, lat_dim, indices, lambda block: reduce(block, axis),
+                         time_dim=time_dim, block_bytes=block_bytes)
+    result = da.isel({lat_dim: 0}, drop=True).copy(data=values.squeeze(axis))
+    result.attrs['lat_band'] = (lat_min, lat_max)
+    return result
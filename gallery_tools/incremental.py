@@ -0,0 +1,91 @@
+"""
+Content-hash incremental rebuilds for the sphinx-gallery build.
+
+sphinx-gallery only re-runs an example when its source differs from the copy
+it executed last time (recorded in ``<gallery_dir>/.../<example>.py.md5``).
+Data files are not part of that check, so an updated ``geocat.datafiles``
+input would silently keep serving stale figures.
+
+This extension keys each example on its source *and* the hashes of every data
+file it reads through ``geocat.datafiles.get``.  Before sphinx-gallery scans the
+examples, any example whose key changed has its ``.md5`` record removed, which
+makes sphinx-gallery execute it again.  Every other example reuses the figures
+and output stored by the previous build.
+"""
+
+import hashlib
+import os
+
+from .datafiles import datafiles_pooch, file_sha256
+from .manifest import example_scripts, scan_datafiles
+
+KEY_SUFFIX = '.datahash'
+
+
+def datafile_hash(name):
+    """Return the content hash of a ``geocat.datafiles`` file.
+
+    The hash recorded in the data registry is used when available, so files do
+    not have to be read (or even downloaded) to compute it.
+    """
+    known = datafiles_pooch().registry.get(name)
+    if known:
+        return known
+    import geocat.datafiles
+    return 'sha256:' + file_sha256(geocat.datafiles.get(name))
+
+
+def example_key(path):
+    """Return the hash of an example's source plus the data files it reads."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        sha.update(f.read())
+    for name in scan_datafiles(path):
+        sha.update(name.encode() + b'\0' + datafile_hash(name).encode() + b'\0')
+    return sha.hexdigest()
+
+
+def invalidate_stale_examples(examples_dir, gallery_dir):
+    """Force a re-run of every example whose content key changed.
+
+    Returns the list of example paths that were invalidated.
+    """
+    stale = []
+    for path in example_scripts(examples_dir, pattern='*.py'):
+        target = os.path.join(gallery_dir, os.path.relpath(path, examples_dir))
+        key = example_key(path)
+
+        key_file = target + KEY_SUFFIX
+        previous = None
+        if os.path.exists(key_file):
+            with open(key_file) as f:
+                previous = f.read().strip()
+        if previous == key:
+            continue
+
+        if os.path.exists(target + '.md5'):
+            os.remove(target + '.md5')
+        os.makedirs(os.path.dirname(key_file), exist_ok=True)
+        with open(key_file, 'w') as f:
+            f.write(key)
+        stale.append(path)
+    return stale
+
+
+def _builder_inited(app):
+    conf = app.config.sphinx_gallery_conf
+    examples_dirs = conf['examples_dirs']
+    gallery_dirs = conf['gallery_dirs']
+    if isinstance(examples_dirs, str):
+        examples_dirs = [examples_dirs]
+    if isinstance(gallery_dirs, str):
+        gallery_dirs = [gallery_dirs]
+    for examples_dir, gallery_dir in zip(examples_dirs, gallery_dirs):
+        invalidate_stale_examples(os.path.join(app.srcdir, examples_dir),
+                                  os.path.join(app.srcdir, gallery_dir))
+
+
+def setup(app):
+    # Run before sphinx-gallery's own builder-inited handler (priority 500)
+    app.connect('builder-inited', _builder_inited, priority=400)
+    return {'parallel_read_safe': True}
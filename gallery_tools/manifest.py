@@ -0,0 +1,72 @@
+"""
+Static discovery of the data files used by the gallery examples.
+
+Every example reads its input through ``geocat.datafiles.get("<name>")`` with a
+literal file name, so the full set of inputs can be found by parsing the
+scripts, without running them.
+"""
+
+import ast
+import glob
+import os
+
+
+def example_scripts(examples_dir='Plots', pattern='NCL_*.py'):
+    """Return the sorted paths of all scripts matching ``pattern`` under ``examples_dir``."""
+    return sorted(glob.glob(os.path.join(examples_dir, '**', pattern), recursive=True))
+
+
+def _datafiles_aliases(tree):
+    """Names under which ``geocat.datafiles`` (or its ``get``) is imported."""
+    modules = set()
+    functions = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name == 'geocat.datafiles':
+                    modules.add(alias.asname or 'geocat.datafiles')
+        elif isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                if node.module == 'geocat' and alias.name == 'datafiles':
+                    modules.add(alias.asname or 'datafiles')
+                elif node.module == 'geocat.datafiles' and alias.name == 'get':
+                    functions.add(alias.asname or 'get')
+    return modules, functions
+
+
+def _dotted_name(node):
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        parent = _dotted_name(node.value)
+        if parent is not None:
+            return parent + '.' + node.attr
+    return None
+
+
+def scan_datafiles(path):
+    """Return the sorted data file names an example script passes to ``geocat.datafiles.get``.
+
+    Only string literals are recognised; calls with computed arguments are ignored.
+    """
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    modules, functions = _datafiles_aliases(tree)
+    targets = {module + '.get' for module in modules} | functions
+
+    names = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call) or not node.args:
+            continue
+        if _dotted_name(node.func) not in targets:
+            continue
+        arg = node.args[0]
+        if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+            names.add(arg.value)
+    return sorted(names)
+
+
+def scan_examples(examples_dir='Plots'):
+    """Map every example script under ``examples_dir`` to the data files it reads."""
+    return {path: scan_datafiles(path) for path in example_scripts(examples_dir)}
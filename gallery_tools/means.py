@@ -0,0 +1,159 @@
+"""
+Zonal, meridional and area means with weights cached per grid.
+
+``NCL_leg_1`` averages ``uv300.nc`` over longitude for one time step, and the
+same pattern recurs for profiles such as ``NCL_xy_3``.  :class:`GridMeans`
+computes the latitude weights (cosine or Gaussian quadrature) and the
+normalisation for a land/sea style mask once per grid, and :func:`grid_means`
+keeps them for every grid it has seen.  Each mean reduces all leading
+dimensions (times, levels, ...) in one vectorized contraction, reading the
+data a block of the leading dimension at a time, so a full zonal-mean time
+series costs about one read of the data::
+
+    uz = zonal_mean(ds.U)               # (time, lat)
+    u_profile = area_mean(ds.U)         # (time, lev)
+"""
+
+import functools
+
+import numpy as np
+
+BLOCK_BYTES = 64 * 2**20
+
+
+def latitude_weights(lat, weights='cos'):
+    """Return the weight of each latitude in ``lat`` (degrees).
+
+    ``weights`` is ``'cos'`` for the cosine of latitude, ``'gaussian'`` for
+    Gaussian quadrature weights (``lat`` must then be a Gaussian grid), or
+    ``None`` for equal weights.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    if weights is None:
+        return np.ones(lat.shape)
+    if weights == 'cos':
+        return np.cos(np.deg2rad(lat))
+    if weights == 'gaussian':
+        nodes, w = np.polynomial.legendre.leggauss(len(lat))
+        order = np.argsort(lat)
+        if not np.allclose(lat[order], np.rad2deg(np.arcsin(nodes)), atol=0.01):
+            raise ValueError('latitudes are not a Gaussian grid')
+        result = np.empty(lat.shape)
+        result[order] = w
+        return result
+    raise ValueError('unknown latitude weights {!r}'.format(weights))
+
+
+class GridMeans:
+    """Weighted means over a (lat, lon) grid, with the weights computed once.
+
+    Parameters
+    ----------
+    lat, lon : array-like
+        Grid coordinates, in degrees.
+    weights : str or None
+        Latitude weights; see :func:`latitude_weights`.
+    mask : array-like, optional
+        ``(lat, lon)`` booleans, True where points are included in the means
+        (e.g. a land mask).  Missing values in the data are always skipped.
+    """
+
+    def __init__(self, lat, lon, weights='cos', mask=None):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        shape = (len(self.lat), len(self.lon))
+        self.mask = np.ones(shape) if mask is None else np.asarray(mask, dtype=np.float64).reshape(shape)
+        self.lat_weights = latitude_weights(self.lat, weights)
+
+        # Weights and normalisation of each reduction for data without
+        # missing values
+        self.area_weights = self.lat_weights[:, None] * self.mask
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self._zonal = self.mask / self.mask.sum(axis=1, keepdims=True)
+            self._meridional = self.area_weights / self.area_weights.sum(axis=0, keepdims=True)
+            self._area = self.area_weights / self.area_weights.sum()
+
+    def _reduce(self, da, weights, normalised, subscripts, lat_dim, lon_dim, block_bytes):
+        """Contract ``da`` with ``weights`` over the grid dimensions.
+
+        ``subscripts`` is an ``einsum`` specification in which ``j`` indexes
+        latitude and ``i`` longitude.
+
+        Blocks without missing values use the precomputed ``normalised``
+        weights; other blocks are normalised by the weights of their valid
+        points.
+        """
+        other = [d for d in da.dims if d not in (lat_dim, lon_dim)]
+        da = da.transpose(*other, lat_dim, lon_dim)
+        kept = subscripts.split('->')[1]
+        reduced = [d for d, index in ((lat_dim, 'j'), (lon_dim, 'i')) if index not in kept]
+
+        if other:
+            step = max(int(block_bytes // max(da[{other[0]: 0}].nbytes, 1)), 1)
+            starts = range(0, da.sizes[other[0]], step)
+            blocks = [da.isel({other[0]: slice(s, s + step)}).values for s in starts]
+        else:
+            blocks = [da.values]
+
+        results = []
+        for block in blocks:
+            block = np.asarray(block, dtype=np.float64)
+            valid = ~np.isnan(block)
+            if valid.all():
+                results.append(np.einsum(subscripts, block, normalised))
+            else:
+                total = np.einsum(subscripts, np.where(valid, block, 0.), weights)
+                count = np.einsum(subscripts, valid.astype(np.float64), weights)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    results.append(total / count)
+        values = np.concatenate(results) if other else results[0]
+        return da.isel({d: 0 for d in reduced}, drop=True).copy(data=values)
+
+    def zonal(self, da, lat_dim='lat', lon_dim='lon', block_bytes=BLOCK_BYTES):
+        """Return the mean of ``da`` over longitude."""
+        return self._reduce(da, self.mask, self._zonal, '...ji,ji->...j',
+                            lat_dim, lon_dim, block_bytes)
+
+    def meridional(self, da, lat_dim='lat', lon_dim='lon', block_bytes=BLOCK_BYTES):
+        """Return the latitude-weighted mean of ``da`` over latitude."""
+        return self._reduce(da, self.area_weights, self._meridional, '...ji,ji->...i',
+                            lat_dim, lon_dim, block_bytes)
+
+    def area(self, da, lat_dim='lat', lon_dim='lon', block_bytes=BLOCK_BYTES):
+        """Return the latitude-weighted mean of ``da`` over the whole grid."""
+        return self._reduce(da, self.area_weights, self._area, '...ji,ji->...',
+                            lat_dim, lon_dim, block_bytes)
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_grid_means(lat, lon, weights, mask):
+    if mask is not None:
+        mask = np.frombuffer(mask, dtype=bool)
+    return GridMeans(lat, lon, weights, mask)
+
+
+def grid_means(lat, lon, weights='cos', mask=None):
+    """Return the :class:`GridMeans` for a grid, reusing it for grids seen before."""
+    lat = tuple(np.asarray(lat, dtype=np.float64).tolist())
+    lon = tuple(np.asarray(lon, dtype=np.float64).tolist())
+    if mask is not None:
+        mask = np.ascontiguousarray(mask, dtype=bool).tobytes()
+    return _cached_grid_means(lat, lon, weights, mask)
+
+
+def zonal_mean(da, weights='cos', mask=None, lat_dim='lat', lon_dim='lon', **kwargs):
+    """Return the mean of ``da`` over longitude, using the cached :func:`grid_means`."""
+    grid = grid_means(da[lat_dim], da[lon_dim], weights, mask)
+    return grid.zonal(da, lat_dim, lon_dim, **kwargs)
+
+
+def meridional_mean(da, weights='cos', mask=None, lat_dim='lat', lon_dim='lon', **kwargs):
+    """Return the weighted mean of ``da`` over latitude, using the cached :func:`grid_means`."""
+    grid = grid_means(da[lat_dim], da[lon_dim], weights, mask)
+    return grid.meridional(da, lat_dim, lon_dim, **kwargs)
+
+
+def area_mean(da, weights='cos', mask=None, lat_dim='lat', lon_dim='lon', **kwargs):
+    """Return the weighted mean of ``da`` over the grid, using the cached :func:`grid_means`."""
+    grid = grid_means(da[lat_dim], da[lon_dim], weights, mask)
+    return grid.area(da, lat_dim, lon_dim, **kwargs)
@@ -0,0 +1,139 @@
+"""
+Warm worker pool for running the gallery examples.
+
+Importing cartopy, matplotlib, xarray and geocat takes several seconds, which
+is most of the runtime of the smaller examples.  This pool starts a
+``forkserver`` process that imports those modules (including the
+``geocat.viz.cmaps`` colormap table) once.  Every example then runs in a fresh
+child forked from that server: it starts with all modules already loaded but
+without any state left over from other examples, and the child exits once the
+example is done.
+
+Run as ``python -m gallery_tools.pool --jobs 4`` to execute every example and
+save its figures.  Platforms without ``forkserver`` fall back to ``spawn``,
+which pays the import cost in every child.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+
+from .datafiles import STORE_VARIABLE
+from .execute import run_example
+from .manifest import example_scripts
+
+#: Modules imported once by the fork server and shared by every example
+PRELOAD = [
+    'numpy',
+    'pandas',
+    'matplotlib',
+    'matplotlib.pyplot',
+    'xarray',
+    'netCDF4',
+    'shapely.geometry',
+    'cartopy.crs',
+    'cartopy.feature',
+    'cartopy.mpl.geoaxes',
+    'cartopy.mpl.ticker',
+    'cartopy.io.shapereader',
+    'geocat.datafiles',
+    'geocat.comp',
+    'geocat.viz.cmaps',
+    'geocat.viz.util',
+    'gallery_tools.execute',
+]
+
+
+def _run(task):
+    path, output_dir = task
+    return run_example(path, output_dir=output_dir)
+
+
+class WarmPool:
+    """A pool of single-use example workers forked from a preloaded server.
+
+    Parameters
+    ----------
+    processes : int, optional
+        Number of examples run concurrently (default: number of CPUs).
+    preload : list of str, optional
+        Modules imported once by the fork server (default: :data:`PRELOAD`).
+    """
+
+    def __init__(self, processes=None, preload=PRELOAD):
+        # The fork server inherits the environment when it starts, so select
+        # the headless backend before anything imports matplotlib
+        os.environ['MPLBACKEND'] = 'Agg'
+        if os.environ.get(STORE_VARIABLE):
+            # Importing geocat.datafiles downloads its registry; with a data
+            # store, each example installs the store-backed module instead
+            preload = [name for name in preload if name != 'geocat.datafiles']
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            ctx = multiprocessing.get_context('forkserver')
+            ctx.set_forkserver_preload(list(preload))
+        else:
+            ctx = multiprocessing.get_context('spawn')
+        self._ctx = ctx
+        self._processes = processes
+        self._pool = self._new_pool()
+
+    def _new_pool(self):
+        # maxtasksperchild=1 gives every example its own freshly forked child
+        return self._ctx.Pool(processes=self._processes, maxtasksperchild=1)
+
+    def run_one(self, path, output_dir=None, timeout=None):
+        """Run a single example and return its :func:`~gallery_tools.execute.run_example` result.
+
+        An example still running after ``timeout`` seconds is reported as an
+        error, and the pool is replaced so that its worker is killed.
+        """
+        try:
+            return self._pool.apply_async(_run, ((path, output_dir),)).get(timeout)
+        except multiprocessing.TimeoutError:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = self._new_pool()
+            return {'example': path, 'error': 'timed out after {}s'.format(timeout)}
+
+    def run(self, examples, output_dir=None):
+        """Run ``examples`` concurrently, yielding their results in input order."""
+        tasks = [(path, output_dir) for path in examples]
+        return self._pool.imap(_run, tasks)
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is not None:
+            self._pool.terminate()
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the gallery examples in a warm worker pool.")
+    parser.add_argument('examples', nargs='*',
+                        help="example scripts to run (default: all of Plots/**/NCL_*.py)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="number of examples to run at once (default: number of CPUs)")
+    parser.add_argument('--output-dir', default=os.path.join('_build', 'examples'),
+                        help="directory to save the figures to")
+    args = parser.parse_args(argv)
+
+    status = 0
+    with WarmPool(processes=args.jobs) as pool:
+        for result in pool.run(args.examples or example_scripts(), args.output_dir):
+            if result['error']:
+                status = 1
+                print('FAILED {}\n{}'.format(result['example'], result['error']), file=sys.stderr)
+            else:
+                print('{:45s} {:6.2f}s'.format(result['example'], result['wall']))
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Compact, indexed store for shapefile geometries.
+
+Reading a 10m Natural Earth shapefile with ``cartopy.io.shapereader.Reader``
+parses every record, even when an example only needs a couple of countries.
+:func:`convert` rewrites a shapefile once into a store directory holding
+
+``geometries.wkb``
+    all geometries as concatenated WKB, memory-mapped on load
+``offsets.npy``
+    the byte offset of each geometry in ``geometries.wkb``
+``bounds.npy``
+    the ``(minx, miny, maxx, maxy)`` bounding box of each geometry
+``attributes.json``
+    the attribute records
+``index/<field>.json``
+    value -> record ids indexes for the attribute fields queried so far
+
+A :class:`ShapeStore` answers attribute queries from the index and bounding
+box queries from an STRtree, and decodes only the matching geometries::
+
+    store = natural_earth_store('cultural', '10m', 'admin_0_countries')
+    china = store.geometries(store.where('ADMIN', ['China', 'Taiwan']))
+    visible = store.geometries(store.query_bbox([100, 145, 15, 55]))
+"""
+
+import argparse
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import shapely
+
+from . import cache_dir
+
+
+def convert(shapefile, store_dir, index_fields=()):
+    """Convert ``shapefile`` into a store at ``store_dir`` and return it as a :class:`ShapeStore`."""
+    from cartopy.io.shapereader import Reader
+
+    parent = os.path.dirname(os.path.abspath(store_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent)
+    try:
+        offsets = [0]
+        bounds = []
+        attributes = []
+        with open(os.path.join(tmp, 'geometries.wkb'), 'wb') as f:
+            for record in Reader(shapefile).records():
+                geometry = record.geometry
+                data = shapely.to_wkb(geometry) if geometry is not None else b''
+                f.write(data)
+                offsets.append(offsets[-1] + len(data))
+                bounds.append(geometry.bounds if geometry is not None else (np.nan,) * 4)
+                attributes.append(record.attributes)
+        np.save(os.path.join(tmp, 'offsets.npy'), np.asarray(offsets, dtype=np.int64))
+        np.save(os.path.join(tmp, 'bounds.npy'), np.asarray(bounds, dtype=np.float64).reshape(-1, 4))
+        with open(os.path.join(tmp, 'attributes.json'), 'w') as f:
+            # default=str handles the dates and bytes pyshp may return
+            json.dump(attributes, f, default=str)
+
+        if os.path.exists(store_dir):
+            shutil.rmtree(store_dir)
+        os.rename(tmp, store_dir)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    store = ShapeStore(store_dir)
+    for field in index_fields:
+        store.index(field)
+    return store
+
+
+class ShapeStore:
+    """Read-only access to a store written by :func:`convert`."""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.offsets = np.load(os.path.join(store_dir, 'offsets.npy'), mmap_mode='r')
+        self.bounds = np.load(os.path.join(store_dir, 'bounds.npy'), mmap_mode='r')
+        with open(os.path.join(store_dir, 'geometries.wkb'), 'rb') as f:
+            self._wkb = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) \
+                if os.fstat(f.fileno()).st_size else b''
+        self._attributes = None
+        self._indexes = {}
+        self._tree = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def attributes(self):
+        """The list of attribute records, loaded on first use."""
+        if self._attributes is None:
+            with open(os.path.join(self.store_dir, 'attributes.json')) as f:
+                self._attributes = json.load(f)
+        return self._attributes
+
+    def index(self, field):
+        """Return the ``{value: [record ids]}`` index of attribute ``field``.
+
+        The index is built from the attribute records the first time a field
+        is queried and stored alongside the data for later use.
+        """
+        if field in self._indexes:
+            return self._indexes[field]
+
+        path = os.path.join(self.store_dir, 'index', field + '.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                index = json.load(f)
+        else:
+            index = {}
+            for i, record in enumerate(self.attributes):
+                index.setdefault(str(record.get(field)), []).append(i)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(index, f)
+        self._indexes[field] = index
+        return index
+
+    def where(self, field, values):
+        """Return the sorted ids of the records whose ``field`` is one of ``values``."""
+        if isinstance(values, str):
+            values = [values]
+        index = self.index(field)
+        ids = [i for value in values for i in index.get(str(value), [])]
+        return np.unique(np.asarray(ids, dtype=np.intp))
+
+    @property
+    def tree(self):
+        """STRtree over the record bounding boxes, built on first use."""
+        if self._tree is None:
+            b = np.asarray(self.bounds)
+            self._tree = shapely.STRtree(shapely.box(b[:, 0], b[:, 1], b[:, 2], b[:, 3]))
+        return self._tree
+
+    def query_bbox(self, extent, exact=False):
+        """Return the sorted ids of the records intersecting ``extent``.
+
+        ``extent`` is ``[x0, x1, y0, y1]`` as for ``GeoAxes.set_extent``.  By
+        default records are selected by their bounding box; with ``exact=True``
+        their geometries are tested against the extent as well.
+        """
+        x0, x1, y0, y1 = extent
+        window = shapely.box(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        ids = np.sort(self.tree.query(window))
+        if exact and len(ids):
+            ids = ids[shapely.intersects(self.geometries(ids), window)]
+        return ids
+
+    def geometries(self, ids=None):
+        """Decode the geometries of records ``ids`` (default: all) into an array."""
+        if ids is None:
+            ids = np.arange(len(self))
+        offsets = self.offsets
+        return shapely.from_wkb([self._wkb[offsets[i]:offsets[i + 1]] or None for i in ids])
+
+    def records(self, ids):
+        """Return ``(geometry, attributes)`` pairs for records ``ids``."""
+        return list(zip(self.geometries(ids), (self.attributes[i] for i in ids)))
+
+
+def natural_earth_store(category, resolution, name, index_fields=()):
+    """Return the store for a Natural Earth shapefile, converting it on first use."""
+    store_dir = os.path.join(cache_dir('shapes'), '{}_{}_{}'.format(resolution, category, name))
+    if not os.path.exists(os.path.join(store_dir, 'attributes.json')):
+        from cartopy.io.shapereader import natural_earth
+        shapefile = natural_earth(category=category, resolution=resolution, name=name)
+        return convert(shapefile, store_dir, index_fields)
+    return ShapeStore(store_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a shapefile into an indexed shape store.")
+    parser.add_argument('shapefile', help="shapefile path, or CATEGORY/RESOLUTION/NAME for Natural Earth data")
+    parser.add_argument('store_dir', nargs='?', help="output directory (required for shapefile paths)")
+    parser.add_argument('--index', action='append', default=[], metavar='FIELD',
+                        help="attribute field to index up front (may be repeated)")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.shapefile):
+        if not args.store_dir:
+            parser.error("store_dir is required when converting a shapefile path")
+        store = convert(args.shapefile, args.store_dir, args.index)
+    else:
+        category, resolution, name = args.shapefile.split('/')
+        store = natural_earth_store(category, resolution, name, args.index)
+    print('{} records in {}'.format(len(store), store.store_dir))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""
+Streamlines integrated for many seed points at once.
+
+``NCL_stream_1`` calls ``ax.streamplot(..., density=4)`` on the global
+``uvt.nc`` grid.  Matplotlib integrates one streamline at a time, one
+adaptive step at a time, in Python.  :func:`streamlines` follows the same
+rules (seeds spiralling in from the edges, an occupancy mask of
+``30 * density`` cells per side that keeps lines apart, ``max_length`` and
+``min_length`` in axes units), but advances a whole batch of seeds together
+with fixed-size RK4 steps on arrays.  Only the bookkeeping of which cells
+each finished line occupies is done line by line.
+
+:func:`streamplot` draws the result as a single ``LineCollection`` (plus
+one ``quiver`` of arrowheads), with all vertices projected at once when a
+Cartopy ``transform`` is given::
+
+    lines, arrows = streamplot(ax, U.lon.data, U.lat.data, U.data, V.data,
+                               density=4, transform=ccrs.PlateCarree(), cache=True)
+
+With ``cache=True`` the seeds of the accepted lines are stored on disk,
+keyed by the field and the parameters, so later frames of the same field
+integrate them all in a single batch.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+from . import cache_dir
+
+
+def _spiral_order(nx, ny):
+    """Return the mask cells ordered from the edges inwards, ring by ring."""
+    mx, my = np.meshgrid(np.arange(nx), np.arange(ny))
+    mx, my = mx.ravel(), my.ravel()
+    ring = np.minimum.reduce([mx, my, nx - 1 - mx, ny - 1 - my])
+    width, height = nx - 2 * ring, ny - 2 * ring
+    # Walk each ring: along the bottom, up the right, along the top, down the left
+    position = np.select(
+        [my == ring, mx == nx - 1 - ring, my == ny - 1 - ring],
+        [mx - ring, width + my - ring, width + height + (nx - 1 - ring - mx)],
+        2 * width + height + (ny - 1 - ring - my))
+    order = np.lexsort((position, ring))
+    return mx[order], my[order]
+
+
+class _Field:
+    """Direction field of (u, v) on a regular grid, in axes coordinates."""
+
+    def __init__(self, u, v):
+        u = np.ma.filled(np.ma.masked_invalid(np.asarray(u, dtype=np.float64)), np.nan)
+        v = np.ma.filled(np.ma.masked_invalid(np.asarray(v, dtype=np.float64)), np.nan)
+        self.ny, self.nx = u.shape
+        # Velocities in axes units (the whole domain is 1 x 1), as (u, v) pairs
+        self.uv = np.stack([u / (self.nx - 1), v / (self.ny - 1)], axis=-1).reshape(-1, 2)
+
+    def direction(self, points):
+        """Return the unit direction at ``points`` (axes coordinates), NaN where undefined."""
+        gx = points[:, 0] * (self.nx - 1)
+        gy = points[:, 1] * (self.ny - 1)
+        # RK4 stages of a line that reached an undefined velocity are NaN
+        undefined = np.isnan(gx) | np.isnan(gy)
+        gx = np.where(undefined, 0., gx)
+        gy = np.where(undefined, 0., gy)
+        i = np.minimum(np.maximum(gx.astype(int), 0), self.nx - 2)
+        j = np.minimum(np.maximum(gy.astype(int), 0), self.ny - 2)
+        fx, fy = (gx - i)[:, None], (gy - j)[:, None]
+        k = j * self.nx + i
+        uv = ((self.uv[k] * (1 - fx) + self.uv[k + 1] * fx) * (1 - fy)
+              + (self.uv[k + self.nx] * (1 - fx) + self.uv[k + self.nx + 1] * fx) * fy)
+        speed = np.hypot(uv[:, 0], uv[:, 1])[:, None]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where((speed > 0) & ~undefined[:, None], uv / speed, np.nan)
+
+
+def _integrate(field, seeds, sign, step, max_steps, occupied, to_cell):
+    """Integrate all ``seeds`` with RK4 steps of length ``step`` (axes units).
+
+    Lines stop when they leave the domain, reach an undefined or zero
+    velocity, or enter a cell already in ``occupied``.  Returns an array of
+    shape ``(steps + 1, len(seeds), 2)``, NaN after each line has stopped.
+    """
+    position = seeds.copy()
+    active = np.arange(len(seeds))
+    trajectory = np.full((max_steps + 1,) + seeds.shape, np.nan)
+    trajectory[0] = seeds
+
+    # Only the lines still running are advanced
+    h = sign * step
+    for k in range(max_steps):
+        p = position[active]
+        k1 = field.direction(p)
+        k2 = field.direction(p + 0.5 * h * k1)
+        k3 = field.direction(p + 0.5 * h * k2)
+        k4 = field.direction(p + h * k3)
+        new = p + h / 6. * (k1 + 2 * k2 + 2 * k3 + k4)
+
+        with np.errstate(invalid='ignore'):
+            ok = np.isfinite(new).all(axis=1) & (new >= 0).all(axis=1) & (new <= 1).all(axis=1)
+        cx, cy = to_cell(np.where(ok[:, None], new, 0.))
+        ok &= ~occupied[cy, cx]
+        active = active[ok]
+        position[active] = new[ok]
+        trajectory[k + 1, active] = new[ok]
+        if not len(active):
+            return trajectory[:k + 2]
+    return trajectory
+
+
+def _kept_length(cells, occupied, visited):
+    """Return how many points of a half-line to keep.
+
+    A half-line is cut where it enters a cell occupied by another line, a
+    cell in ``visited`` (the other half of the same line) or a cell it has
+    already left (a closed loop).  The first cell (the seed's) is always
+    kept.
+    """
+    change = np.flatnonzero(np.r_[True, np.diff(cells) != 0])
+    run_cells = cells[change]
+    blocked = occupied.ravel()[run_cells] | np.isin(run_cells, visited)
+    _, first = np.unique(run_cells, return_index=True)
+    revisit = np.ones(len(run_cells), bool)
+    revisit[first] = False
+    stop = np.flatnonzero((blocked | revisit)[1:])
+    return len(cells) if not len(stop) else change[stop[0] + 1]
+
+
+def _seed_batches(sx, sy, occupied, spacing, batch_size):
+    """Yield batches of free seed cells, ``(mx, my)``, taken in spiral order.
+
+    Each batch holds at most one seed per block of ``spacing`` x ``spacing``
+    cells.  The occupancy is checked again before every batch, as it is
+    filled in by the lines accepted from the previous one.
+    """
+    blocks = (sy // spacing) * (sx.max() // spacing + 1) + sx // spacing
+    remaining = np.arange(len(sx))
+    while len(remaining):
+        remaining = remaining[~occupied[sy[remaining], sx[remaining]]]
+        _, first = np.unique(blocks[remaining], return_index=True)
+        chosen = np.sort(first)[:batch_size]
+        if not len(chosen):
+            return
+        batch = remaining[chosen]
+        remaining = np.delete(remaining, chosen)
+        yield sx[batch], sy[batch]
+
+
+def _cache_path(x, y, u, v, params):
+    sha = hashlib.sha256()
+    for array in (x, y, u, v):
+        sha.update(np.ascontiguousarray(array, dtype=np.float64).tobytes())
+    sha.update(repr(params).encode())
+    return os.path.join(cache_dir('streamlines'), sha.hexdigest() + '.npy')
+
+
+def streamlines(x, y, u, v, density=1, max_length=4.0, min_length=0.1, step=1.0,
+                spacing=3, batch_size=1024, cache=False):
+    """Return the streamlines of (``u``, ``v``) as a list of ``(n, 2)`` arrays of ``x, y``.
+
+    Parameters
+    ----------
+    x, y : array-like
+        1-D, evenly spaced grid coordinates.
+    u, v : array-like
+        ``(len(y), len(x))`` velocity components; NaN or masked where undefined.
+    density : float or (float, float)
+        As for ``matplotlib.pyplot.streamplot``: the occupancy mask has
+        ``30 * density`` cells along each axis.
+    max_length, min_length : float
+        Longest and shortest streamline, in axes units (the domain is 1 x 1).
+    step : float
+        RK4 step as a fraction of a mask cell.
+    spacing, batch_size : int
+        Seeds are integrated in batches of at most ``batch_size`` seeds, at
+        most one per block of ``spacing`` x ``spacing`` mask cells, so that
+        lines of the same batch rarely retrace each other.  Lines are
+        accepted in spiral order within each batch, but these change which
+        seeds are tried first, and so the exact layout of the lines.
+    cache : bool
+        Store the accepted seeds on disk, and reuse them on later calls for
+        the same field and parameters.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    field = _Field(u, v)
+    mnx, mny = (30 * np.broadcast_to(density, 2)).astype(int)
+    occupied = np.zeros((mny, mnx), bool)
+
+    def to_cell(points):
+        # Points are within the domain, [0, 1] x [0, 1]
+        return ((points[:, 0] * (mnx - 1) + 0.5).astype(int),
+                (points[:, 1] * (mny - 1) + 0.5).astype(int))
+
+    h = step * min(1. / mnx, 1. / mny)
+    max_steps = int(np.ceil(max_length / 2 / h))
+
+    path = None
+    cached_seeds = None
+    if cache:
+        path = _cache_path(x, y, u, v, (density, max_length, min_length, step))
+        if os.path.exists(path):
+            cached_seeds = np.load(path)
+
+    if cached_seeds is not None:
+        batches = [cached_seeds]
+    else:
+        sx, sy = _spiral_order(mnx, mny)
+        batches = _seed_batches(sx, sy, occupied, spacing, batch_size)
+
+    lines = []
+    accepted = []
+    for seeds in batches:
+        if cached_seeds is None:
+            seeds = np.stack([seeds[0] / (mnx - 1), seeds[1] / (mny - 1)], axis=1)
+        backward = _integrate(field, seeds, -1., h, max_steps, occupied, to_cell)
+        forward = _integrate(field, seeds, 1., h, max_steps, occupied, to_cell)
+        # Number of points of each half-line
+        lengths = [np.isfinite(trajectory[:, :, 0]).sum(axis=0) for trajectory in (backward, forward)]
+        seed_cx, seed_cy = to_cell(seeds)
+
+        flat = occupied.ravel()
+        for n, seed in enumerate(seeds):
+            if occupied[seed_cy[n], seed_cx[n]]:
+                continue
+            cells = []
+            for trajectory, length in zip((backward, forward), lengths):
+                px, py = to_cell(trajectory[:length[n], n])
+                cells.append(py * mnx + px)
+
+            # Every step is ``h`` long.  Reject lines that are too short even
+            # before checking them against their own cells.
+            reach = [np.argmax(flat[c]) if flat[c].any() else len(c) for c in cells]
+            if (reach[0] + reach[1] - 2) * h <= min_length:
+                continue
+
+            halves = []
+            visited = np.empty(0, int)
+            for trajectory, c in zip((backward, forward), cells):
+                keep = _kept_length(c, occupied, visited)
+                halves.append(trajectory[:keep, n])
+                visited = np.union1d(visited, c[:keep])
+            if (len(halves[0]) + len(halves[1]) - 2) * h <= min_length:
+                continue
+            occupied.ravel()[visited] = True
+            lines.append(np.concatenate([halves[0][::-1], halves[1][1:]]))
+            accepted.append(seed)
+
+    if path is not None and cached_seeds is None:
+        np.save(path, np.asarray(accepted).reshape(-1, 2))
+
+    scale = np.array([x[-1] - x[0], y[-1] - y[0]])
+    origin = np.array([x[0], y[0]])
+    return [origin + line * scale for line in lines]
+
+
+def _split_at_jumps(points, max_jump):
+    """Split a line where consecutive points jump further than ``max_jump`` in x (a map seam)."""
+    breaks = np.flatnonzero(np.abs(np.diff(points[:, 0])) > max_jump) + 1
+    return [part for part in np.split(points, breaks) if len(part) > 1]
+
+
+def streamplot(ax, x, y, u, v, density=1, transform=None, color='k', linewidth=1,
+               arrowsize=1, zorder=None, **kwargs):
+    """Draw the :func:`streamlines` of (``u``, ``v``) on ``ax``.
+
+    ``transform`` is the Cartopy CRS of ``x`` and ``y`` on a ``GeoAxes``; all
+    vertices are then projected to the map projection in one call.  Other
+    keyword arguments are passed to :func:`streamlines`.
+
+    Returns the ``LineCollection`` of the lines and the ``Quiver`` of the
+    arrowheads placed half-way along each line.
+    """
+    from matplotlib.collections import LineCollection
+
+    lines = streamlines(x, y, u, v, density=density, **kwargs)
+
+    if transform is not None and hasattr(ax, 'projection'):
+        vertices = np.concatenate(lines) if lines else np.empty((0, 2))
+        projected = ax.projection.transform_points(transform, vertices[:, 0], vertices[:, 1])[:, :2]
+        lines = np.split(projected, np.cumsum([len(line) for line in lines])[:-1])
+        x0, x1 = ax.projection.x_limits
+        lines = [part for line in lines for part in _split_at_jumps(line, (x1 - x0) / 2)]
+
+    # One arrowhead half-way along each line, drawn as a single quiver so
+    # that the heads keep their size on screen
+    tails, heads = [], []
+    for line in lines:
+        s = np.cumsum(np.hypot(*np.diff(line, axis=0).T))
+        i = min(np.searchsorted(s, s[-1] / 2), len(line) - 2)
+        tails.append(line[i])
+        heads.append(line[i + 1])
+    tails, heads = np.reshape(tails, (-1, 2)), np.reshape(heads, (-1, 2))
+    direction = heads - tails
+    direction /= np.maximum(np.hypot(*direction.T), np.finfo(float).tiny)[:, None]
+
+    line_collection = LineCollection(lines, colors=color, linewidths=linewidth, transform=ax.transData)
+    ax.add_collection(line_collection)
+    # Arrowheads 0.1 inch long (times arrowsize), made of a head with no shaft
+    width = 0.0125 * arrowsize
+    arrow_collection = ax.quiver(tails[:, 0], tails[:, 1], direction[:, 0], direction[:, 1],
+                                 angles='xy', pivot='middle', units='inches', scale_units='inches',
+                                 scale=1. / (8 * width), width=width, headwidth=6, headlength=8,
+                                 headaxislength=7, color=color,
+                                 transform=getattr(ax, 'projection', ax.transData))
+    if zorder is not None:
+        line_collection.set_zorder(zorder)
+        arrow_collection.set_zorder(zorder)
+    return line_collection, arrow_collection
@@ -0,0 +1,33 @@
+import pytest
+
+
+@pytest.fixture
+def cache_root(tmp_path, monkeypatch):
+    """Point the gallery tools cache at a temporary directory."""
+    root = tmp_path / 'cache'
+    monkeypatch.setenv('GEOCAT_EXAMPLES_CACHE', str(root))
+    return root
+
+
+@pytest.fixture
+def squares_shapefile(tmp_path):
+    """A shapefile of 10 x 5 degree squares tiling 0-100E, 0-50N, with a ring-shaped last record.
+
+    Records have a ``NAME`` ("sq<i>_<j>") and a ``REGION`` ("west" or "east")
+    attribute.
+    """
+    shapefile = pytest.importorskip('shapefile')
+    path = str(tmp_path / 'squares')
+    with shapefile.Writer(path, shapeType=shapefile.POLYGON) as writer:
+        writer.field('NAME', 'C', size=16)
+        writer.field('REGION', 'C', size=8)
+        for i in range(10):
+            for j in range(10):
+                x, y = 10. * i, 5. * j
+                writer.poly([[(x, y), (x, y + 5), (x + 10, y + 5), (x + 10, y), (x, y)]])
+                writer.record('sq{}_{}'.format(i, j), 'west' if i < 5 else 'east')
+        # A ring with a hole, to check polygons with interiors
+        writer.poly([[(110, 0), (110, 20), (130, 20), (130, 0), (110, 0)],
+                     [(115, 5), (125, 5), (125, 15), (115, 15), (115, 5)]])
+        writer.record('ring', 'east')
+    return path + '.shp'
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pytest
+import xarray as xr
+
+from gallery_tools.climatology import anomaly, climatology, streaming_time_mean
+
+
+@pytest.fixture
+def path(tmp_path):
+    rng = np.random.default_rng(0)
+    ts = 280 + rng.normal(size=(30, 4, 5))
+    ts[3, 1, 2] = np.nan
+    ds = xr.Dataset({'TS': (('time', 'lat', 'lon'), ts)},
+                    coords={'time': np.arange(30.), 'lat': np.arange(4.), 'lon': np.arange(5.)})
+    path = str(tmp_path / 'ts.nc')
+    ds.to_netcdf(path)
+    return path
+
+
+def test_streaming_time_mean_matches_xarray(path):
+    with xr.open_dataset(path) as ds:
+        expected = ds.TS.mean('time')
+        for time_chunk in (1, 7, 100):
+            xr.testing.assert_allclose(streaming_time_mean(ds.TS, time_chunk=time_chunk), expected)
+
+
+def test_climatology_is_cached(path, cache_root):
+    with xr.open_dataset(path) as ds:
+        expected = ds.TS.sel(time=slice(5, 20)).mean('time')
+    first = climatology(path, 'TS', period=(5, 20), decode_times=False)
+    xr.testing.assert_allclose(first, expected)
+    files = [f for f in os.listdir(cache_root / 'climatologies') if f.endswith('.nc')]
+    assert len(files) == 1
+    xr.testing.assert_allclose(climatology(path, 'TS', period=(5, 20), decode_times=False), expected)
+
+    # Another period is another entry
+    climatology(path, 'TS', decode_times=False)
+    assert len([f for f in os.listdir(cache_root / 'climatologies') if f.endswith('.nc')]) == 2
+
+
+def test_rewritten_files_are_not_served_from_the_cache(path, cache_root):
+    climatology(path, 'TS')
+    with xr.open_dataset(path) as ds:
+        changed = (ds + 1).load()
+    changed.to_netcdf(path)
+    xr.testing.assert_allclose(climatology(path, 'TS'), changed.TS.mean('time'))
+
+
+def test_anomaly_matches_xarray(path, cache_root):
+    with xr.open_dataset(path, decode_times=False) as ds:
+        expected = ds.TS.isel(time=3) - ds.TS.mean('time')
+    xr.testing.assert_allclose(anomaly(path, 'TS', time=3, decode_times=False), expected)
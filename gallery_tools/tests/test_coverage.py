@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+import shapely
+import xarray as xr
+
+from gallery_tools import coverage as coverage_module
+from gallery_tools.coverage import coverage, regional_mean
+
+LAT = np.arange(-89.5, 90, 1.)
+LON = np.arange(0.5, 360, 1.)
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('GEOCAT_EXAMPLES_CACHE', str(tmp_path))
+    monkeypatch.setattr(coverage_module, '_memory', coverage_module.collections.OrderedDict())
+
+
+def test_box_coverage():
+    # 10.25-20.75 E by 30.5-40 N: whole cells inside, half and quarter cells on the edges
+    box = shapely.box(10.25, 30.5, 20.75, 40.)
+    mask, fraction = coverage(LAT, LON, [box], cache=False)
+
+    expected_mask = ((LAT[:, None] > 30.5) & (LAT[:, None] < 40.)
+                     & (LON > 10.25) & (LON < 20.75))
+    np.testing.assert_array_equal(mask, expected_mask)
+
+    x = np.clip(np.minimum(LON + 0.5, 20.75) - np.maximum(LON - 0.5, 10.25), 0, 1)
+    y = np.clip(np.minimum(LAT + 0.5, 40.) - np.maximum(LAT - 0.5, 30.5), 0, 1)
+    np.testing.assert_allclose(fraction, y[:, None] * x, atol=1e-12)
+
+
+def test_geometries_across_the_dateline():
+    # Longitudes in -180..180 against a 0..360 grid
+    box = shapely.box(-10., -5., 10., 5.)
+    mask, fraction = coverage(LAT, LON, [box], cache=False)
+    inside = (np.abs(LAT[:, None]) < 5) & ((LON < 10) | (LON > 350))
+    np.testing.assert_array_equal(mask, inside)
+    assert fraction.sum() == pytest.approx(20 * 10)
+
+
+def test_cached_results_match_and_stay_bounded(monkeypatch):
+    monkeypatch.setattr(coverage_module, 'MEMORY_ENTRIES', 2)
+    boxes = [shapely.box(k, 0., k + 5., 5.) for k in range(3)]
+    computed = [coverage(LAT, LON, [box]) for box in boxes]
+    assert len(coverage_module._memory) == 2
+
+    # Read back from disk, then from memory
+    coverage_module._memory.clear()
+    for box, (mask, fraction) in zip(boxes, computed):
+        for _ in range(2):
+            cached_mask, cached_fraction = coverage(LAT, LON, [box])
+            np.testing.assert_array_equal(cached_mask, mask)
+            np.testing.assert_array_equal(cached_fraction, fraction)
+    assert len(coverage_module._memory) == 2
+
+
+def test_regional_mean_matches_weighted_mean():
+    rng = np.random.default_rng(0)
+    da = xr.DataArray(rng.normal(size=(3, len(LAT), len(LON))), dims=('time', 'lat', 'lon'),
+                      coords={'lat': LAT, 'lon': LON})
+    box = shapely.box(100., -20., 140., 10.)
+    inside = ((da.lat > -20) & (da.lat < 10) & (da.lon > 100) & (da.lon < 140))
+    expected = da.where(inside).weighted(np.cos(np.deg2rad(da.lat))).mean(('lat', 'lon'))
+    np.testing.assert_allclose(regional_mean(da, [box], cache=False), expected)
@@ -0,0 +1,111 @@
+import hashlib
+import sys
+import types
+
+import pytest
+
+from gallery_tools import datafiles
+from gallery_tools.datafiles import REGISTRY, STORE_VARIABLE, ContentStore, fetch, serve, use_store
+
+NAME = 'netcdf_files/example.nc'
+CONTENT = b'example data'
+
+
+def write_source(root, files, registry=None):
+    """Write ``files`` ({name: bytes}) and their registry to a directory served by :func:`serve`."""
+    if registry is None:
+        registry = {name: hashlib.sha256(data).hexdigest() for name, data in files.items()}
+    for name, data in files.items():
+        path = root / 'files' / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    lines = ['{} sha256:{}'.format(name, digest) for name, digest in sorted(registry.items())]
+    (root / 'files' / REGISTRY).write_text('\n'.join(lines) + '\n')
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """Record the URL of every download."""
+    urls = []
+    download = datafiles._download
+
+    def recording(url, directory, known_hash):
+        urls.append(url)
+        return download(url, directory, known_hash)
+
+    monkeypatch.setattr(datafiles, '_download', recording)
+    return urls
+
+
+def test_fetch_rejects_corrupted_files(tmp_path):
+    source = tmp_path / 'source'
+    write_source(source, {NAME: b'corrupted'},
+                 registry={NAME: hashlib.sha256(CONTENT).hexdigest()})
+    with serve(source) as url, pytest.raises(ValueError, match='hash'):
+        fetch([NAME], tmp_path / 'store', base_url=url)
+    assert not ContentStore(tmp_path / 'store').has(NAME, hashlib.sha256(CONTENT).hexdigest())
+
+
+def test_second_fetch_reuses_stored_files(tmp_path, downloads):
+    source = tmp_path / 'source'
+    write_source(source, {NAME: CONTENT})
+    with serve(source) as url:
+        paths = fetch([NAME, REGISTRY], tmp_path / 'store', base_url=url)
+        assert open(paths[NAME], 'rb').read() == CONTENT
+        del downloads[:]
+        assert fetch([NAME, REGISTRY], tmp_path / 'store', base_url=url) == paths
+    # Only the registry is downloaded again, to check for updates
+    assert downloads == [url + REGISTRY]
+
+
+def test_fetch_picks_up_registry_updates(tmp_path):
+    source = tmp_path / 'source'
+    write_source(source, {NAME: CONTENT})
+    with serve(source) as url:
+        fetch([NAME], tmp_path / 'store', base_url=url)
+        write_source(source, {NAME: b'updated', 'netcdf_files/new.nc': b'new'})
+        paths = fetch([NAME, 'netcdf_files/new.nc'], tmp_path / 'store', base_url=url)
+    assert open(paths[NAME], 'rb').read() == b'updated'
+    assert open(paths['netcdf_files/new.nc'], 'rb').read() == b'new'
+
+
+def test_offline_fetch_uses_the_stored_registry(tmp_path, downloads):
+    source = tmp_path / 'source'
+    write_source(source, {NAME: CONTENT})
+    with serve(source) as url:
+        paths = fetch([NAME], tmp_path / 'store', base_url=url)
+    del downloads[:]
+    assert fetch([NAME], tmp_path / 'store', base_url=url, offline=True) == paths
+    assert not downloads
+    with pytest.raises(KeyError):
+        fetch(['netcdf_files/other.nc'], tmp_path / 'store', base_url=url, offline=True)
+
+
+@pytest.fixture
+def fresh_datafiles(monkeypatch):
+    """Let :func:`use_store` install its stand-in, and undo it afterwards."""
+    pytest.importorskip('pooch')
+    monkeypatch.delitem(sys.modules, 'geocat.datafiles', raising=False)
+    monkeypatch.delenv(STORE_VARIABLE, raising=False)
+    geocat = sys.modules.get('geocat')
+    if geocat is None:
+        monkeypatch.setitem(sys.modules, 'geocat', types.ModuleType('geocat'))
+        sys.modules['geocat'].__path__ = []
+    else:
+        monkeypatch.setattr(geocat, 'datafiles', getattr(geocat, 'datafiles', None), raising=False)
+    yield
+    sys.modules.pop('geocat.datafiles', None)
+
+
+def test_use_store_resolves_get_from_the_store(tmp_path, downloads, fresh_datafiles):
+    source = tmp_path / 'source'
+    write_source(source, {NAME: CONTENT})
+    with serve(source) as url:
+        paths = fetch([NAME, REGISTRY], tmp_path / 'store', base_url=url)
+    del downloads[:]
+
+    use_store(str(tmp_path / 'store'))
+    import geocat.datafiles as gdf
+    assert gdf.get(NAME) == paths[NAME]
+    assert open(gdf.get(NAME), 'rb').read() == CONTENT
+    assert not downloads
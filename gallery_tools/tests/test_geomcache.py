@@ -0,0 +1,62 @@
+import os
+
+import pytest
+import shapely
+
+from gallery_tools.geomcache import visible_geometries
+from gallery_tools.shapestore import convert
+
+ccrs = pytest.importorskip('cartopy.crs')
+
+EXTENT = [12, 47, 3, 22]
+
+
+@pytest.fixture
+def store(squares_shapefile, tmp_path):
+    return convert(squares_shapefile, str(tmp_path / 'store'))
+
+
+def straightforward(store, extent, projection, margin=0.05):
+    """Project every geometry and clip it to the padded window in map coordinates."""
+    x0, x1, y0, y1 = extent
+    dx, dy = (x1 - x0) * margin, (y1 - y0) * margin
+    window = projection.project_geometry(shapely.box(x0 - dx, y0 - dy, x1 + dx, y1 + dy),
+                                         ccrs.PlateCarree())
+    projected = [projection.project_geometry(g, ccrs.PlateCarree()) for g in store.geometries()]
+    return shapely.intersection(shapely.union_all(projected), window)
+
+
+@pytest.mark.parametrize('projection', [ccrs.PlateCarree(), ccrs.Mercator()],
+                         ids=['PlateCarree', 'Mercator'])
+def test_visible_geometries_match_clipping_everything(store, projection, cache_root):
+    geometries = visible_geometries(store, EXTENT, projection, dpi=100, width=6, cache=False)
+    expected = straightforward(store, EXTENT, projection)
+    result = shapely.union_all(geometries)
+    # Simplified to half a pixel: the areas agree to well under a pixel per edge
+    assert result.symmetric_difference(expected).area < 1e-3 * expected.area
+    # Only records touching the window are kept
+    assert len(geometries) < len(store)
+
+
+def test_ids_restrict_the_records(store, cache_root):
+    ids = store.where('NAME', ['sq1_0', 'sq2_1', 'sq9_9'])
+    geometries = visible_geometries(store, EXTENT, ccrs.PlateCarree(), dpi=100, width=6,
+                                    ids=ids, cache=False)
+    # sq9_9 (90-100E, 45-50N) is outside the window
+    assert len(geometries) == 2
+    assert shapely.union_all(geometries).equals(
+        shapely.clip_by_rect(shapely.union_all(store.geometries(ids[:2])), 10.25, 2.05, 48.75, 22.95))
+
+
+def test_cached_geometries_are_reused(store, cache_root):
+    args = (store, EXTENT, ccrs.PlateCarree())
+    first = visible_geometries(*args, dpi=100, width=6)
+    files = os.listdir(cache_root / 'geometries')
+    assert len(files) == 1
+    second = visible_geometries(*args, dpi=100, width=6)
+    assert all(a.equals_exact(b, 0) for a, b in zip(first, second))
+    assert len(second) == len(first)
+
+    # A different output size is a different entry
+    visible_geometries(*args, dpi=200, width=6)
+    assert len(os.listdir(cache_root / 'geometries')) == 2
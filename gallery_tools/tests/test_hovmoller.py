@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from gallery_tools.hovmoller import (lat_band_mean, lon_band_mean, time_lat_section,
+                                     time_lat_sections)
+
+LAT = np.linspace(-87.5, 87.5, 8)
+LON = np.arange(0., 360., 15.)
+
+
+@pytest.fixture(params=['chunked', 'unchunked'])
+def ts(request, tmp_path):
+    """A lazily opened (time, lat, lon) variable with missing values, and the same in memory."""
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(30, len(LAT), len(LON)))
+    values[3, 2, 5] = np.nan
+    values[7, :, 23] = np.nan
+    ds = xr.Dataset({'TS': (('time', 'lat', 'lon'), values)},
+                    coords={'time': np.arange(30.), 'lat': LAT, 'lon': LON})
+    path = str(tmp_path / 'ts.nc')
+    if request.param == 'chunked':
+        ds.to_netcdf(path, format='NETCDF4', encoding={'TS': {'chunksizes': (4, 8, 5)}})
+    else:
+        ds.to_netcdf(path, format='NETCDF3_64BIT')
+    with xr.open_dataset(path) as lazy:
+        yield lazy.TS, ds.TS
+
+
+# Small blocks, so that the time steps are read in several blocks
+BLOCK_BYTES = 2000
+
+
+def test_sections_match_nearest_selection(ts):
+    lazy, expected = ts
+    lons = [80., 0., 350., 20., 82.]
+    sections = time_lat_sections(lazy, lons, block_bytes=BLOCK_BYTES)
+    xr.testing.assert_identical(sections, expected.sel(lon=lons, method='nearest'))
+    xr.testing.assert_identical(time_lat_section(lazy, 200., block_bytes=BLOCK_BYTES),
+                                expected.sel(lon=200., method='nearest'))
+
+
+def test_sections_reject_missing_longitudes(ts):
+    lazy, _ = ts
+    with pytest.raises(KeyError):
+        time_lat_sections(lazy, [100.], method=None)
+
+
+@pytest.mark.parametrize('band', [(60., 100.), (330., 30.), (0., 360.)])
+def test_lon_band_mean_matches_xarray(ts, band):
+    lazy, expected = ts
+    lon_min, lon_max = band
+    if lon_min < lon_max:
+        inside = (expected.lon >= lon_min) & (expected.lon <= lon_max)
+    else:
+        inside = (expected.lon >= lon_min) | (expected.lon <= lon_max)
+    band_mean = lon_band_mean(lazy, lon_min, lon_max, block_bytes=BLOCK_BYTES)
+    xr.testing.assert_allclose(band_mean, expected.isel(lon=inside.values).mean('lon'))
+    assert band_mean.attrs['lon_band'] == band
+
+
+@pytest.mark.parametrize('weighted', [True, False])
+def test_lat_band_mean_matches_xarray(ts, weighted):
+    lazy, expected = ts
+    band = expected.sel(lat=slice(-30, 60))
+    if weighted:
+        expected_mean = band.weighted(np.cos(np.deg2rad(band.lat))).mean('lat')
+    else:
+        expected_mean = band.mean('lat')
+    band_mean = lat_band_mean(lazy, -30, 60, weighted=weighted, block_bytes=BLOCK_BYTES)
+    xr.testing.assert_allclose(band_mean, expected_mean)
+
+
+def test_empty_bands_are_rejected(ts):
+    lazy, _ = ts
+    with pytest.raises(ValueError):
+        lat_band_mean(lazy, 88, 89)
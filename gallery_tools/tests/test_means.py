@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+import xarray as xr
+
+from gallery_tools.means import area_mean, grid_means, latitude_weights, meridional_mean, zonal_mean
+
+LON = np.arange(0., 360., 20.)
+
+# One time step per block, so blocks with and without missing values are both reduced
+BLOCK_BYTES = 1
+
+
+def gaussian_lat(n):
+    return np.rad2deg(np.arcsin(np.polynomial.legendre.leggauss(n)[0]))
+
+
+def field(lat, missing=True):
+    """A (time, lev, lat, lon) field, with missing values in one time step if ``missing``."""
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(4, 3, len(lat), len(LON)))
+    if missing:
+        values[1, 0, 2, 3] = np.nan
+        values[1, 2, :, 5] = np.nan
+    return xr.DataArray(values, dims=('time', 'lev', 'lat', 'lon'),
+                        coords={'time': np.arange(4), 'lev': [850, 500, 300],
+                                'lat': lat, 'lon': LON})
+
+
+@pytest.fixture(params=['cos', 'gaussian', None])
+def weights(request):
+    return request.param
+
+
+@pytest.fixture
+def grid(weights):
+    """A field on a Gaussian grid, and its latitude weights as a DataArray."""
+    da = field(gaussian_lat(12))
+    return da, xr.DataArray(latitude_weights(da.lat, weights), dims='lat')
+
+
+def test_gaussian_weights_integrate_exactly():
+    lat = gaussian_lat(16)
+    w = latitude_weights(lat, 'gaussian')
+    # Quadrature of sin(lat)**2 over the sphere
+    assert (w * np.sin(np.deg2rad(lat))**2).sum() == pytest.approx(2 / 3)
+    with pytest.raises(ValueError):
+        latitude_weights(np.linspace(-80, 80, 16), 'gaussian')
+
+
+def test_zonal_mean_matches_xarray(grid, weights):
+    da, _ = grid
+    xr.testing.assert_allclose(zonal_mean(da, weights, block_bytes=BLOCK_BYTES), da.mean('lon'))
+
+
+def test_meridional_mean_matches_xarray(grid, weights):
+    da, lat_weights = grid
+    xr.testing.assert_allclose(meridional_mean(da, weights, block_bytes=BLOCK_BYTES),
+                               da.weighted(lat_weights).mean('lat'))
+
+
+def test_area_mean_matches_xarray(grid, weights):
+    da, lat_weights = grid
+    xr.testing.assert_allclose(area_mean(da, weights, block_bytes=BLOCK_BYTES),
+                               da.weighted(lat_weights).mean(('lat', 'lon')))
+
+
+def test_means_with_a_mask():
+    da = field(np.linspace(-75, 75, 7))
+    mask = ((da.lat > -50) & (da.lon < 180)).transpose('lat', 'lon')
+    cos = np.cos(np.deg2rad(da.lat))
+    masked = da.where(mask)
+    xr.testing.assert_allclose(zonal_mean(da, mask=mask.values), masked.mean('lon'))
+    xr.testing.assert_allclose(area_mean(da, mask=mask.values),
+                               masked.weighted(cos).mean(('lat', 'lon')))
+
+
+def test_means_without_leading_dimensions():
+    da = field(np.linspace(-75, 75, 7), missing=False).isel(time=0, lev=0, drop=True)
+    cos = np.cos(np.deg2rad(da.lat))
+    xr.testing.assert_allclose(area_mean(da), da.weighted(cos).mean(('lat', 'lon')))
+
+
+def test_grid_means_are_reused():
+    lat = np.linspace(-75, 75, 7)
+    mask = np.ones((len(lat), len(LON)), bool)
+    assert grid_means(lat, LON) is grid_means(list(lat), LON)
+    assert grid_means(lat, LON, mask=mask) is grid_means(lat, LON, mask=mask.copy())
+    assert grid_means(lat, LON, 'cos') is not grid_means(lat, LON, None)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import shapely
+
+from gallery_tools.shapestore import ShapeStore, convert
+
+shapereader = pytest.importorskip('cartopy.io.shapereader')
+
+
+@pytest.fixture
+def store(squares_shapefile, tmp_path):
+    return convert(squares_shapefile, str(tmp_path / 'store'))
+
+
+def test_convert_keeps_geometries_and_attributes(squares_shapefile, store):
+    records = list(shapereader.Reader(squares_shapefile).records())
+    assert len(store) == len(records)
+    geometries = store.geometries()
+    for geometry, record in zip(geometries, records):
+        assert geometry.equals(record.geometry)
+    assert store.attributes == [record.attributes for record in records]
+
+
+def test_where_matches_a_scan_of_the_records(squares_shapefile, store):
+    records = list(shapereader.Reader(squares_shapefile).records())
+    expected = [i for i, r in enumerate(records) if r.attributes['NAME'] in ('sq1_2', 'ring')]
+    np.testing.assert_array_equal(store.where('NAME', ['ring', 'sq1_2', 'missing']), expected)
+
+    east = [i for i, r in enumerate(records) if r.attributes['REGION'] == 'east']
+    np.testing.assert_array_equal(store.where('REGION', 'east'), east)
+
+    # The index is kept on disk and reused by later stores
+    reopened = ShapeStore(store.store_dir)
+    np.testing.assert_array_equal(reopened.where('REGION', 'east'), east)
+    assert 'REGION' in reopened._indexes
+
+
+def test_query_bbox_matches_brute_force(squares_shapefile, store):
+    records = list(shapereader.Reader(squares_shapefile).records())
+    # The window lies within the hole of the ring: only its bounding box intersects
+    extent = [117, 123, 7, 13]
+    assert list(store.query_bbox(extent)) == [len(records) - 1]
+    assert not len(store.query_bbox(extent, exact=True))
+
+    extent = [12, 31, 2, 9]
+    window = shapely.box(12, 2, 31, 9)
+    expected = [i for i, r in enumerate(records) if r.geometry.intersects(window)]
+    np.testing.assert_array_equal(store.query_bbox(extent, exact=True), expected)
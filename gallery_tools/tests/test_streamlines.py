@@ -0,0 +1,59 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from gallery_tools.streamlines import streamlines
+
+
+@pytest.fixture
+def field():
+    """A global-looking grid with a jet, a vortex and a masked region."""
+    x = np.arange(0., 360., 5.)
+    y = np.linspace(-90., 90., 37)
+    lon, lat = np.meshgrid(np.deg2rad(x), np.deg2rad(y))
+    u = 10 * np.cos(3 * lat) + 5 * np.sin(2 * lon) * np.cos(lat)
+    v = 5 * np.cos(2 * lon) * np.sin(2 * lat)
+    u[10:14, 20:30] = np.nan
+    return x, y, u, v
+
+
+def test_lines_stay_inside_the_domain(field):
+    x, y, u, v = field
+    lines = streamlines(x, y, u, v, density=2)
+    assert lines
+    points = np.concatenate(lines)
+    assert np.isfinite(points).all()
+    assert (points[:, 0] >= x[0]).all() and (points[:, 0] <= x[-1]).all()
+    assert (points[:, 1] >= y[0]).all() and (points[:, 1] <= y[-1]).all()
+
+
+def test_lines_do_not_share_mask_cells(field):
+    x, y, u, v = field
+    density = 2
+    lines = streamlines(x, y, u, v, density=density)
+    n = 30 * density
+    owner = {}
+    for k, line in enumerate(lines):
+        cx = np.rint((line[:, 0] - x[0]) / (x[-1] - x[0]) * (n - 1)).astype(int)
+        cy = np.rint((line[:, 1] - y[0]) / (y[-1] - y[0]) * (n - 1)).astype(int)
+        for cell in set(zip(cx.tolist(), cy.tolist())):
+            assert owner.setdefault(cell, k) == k
+
+
+def test_no_warnings_for_undefined_velocities(field):
+    x, y, u, v = field
+    zero = np.zeros_like(u)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)
+        assert streamlines(x, y, zero, zero) == []
+        streamlines(x, y, u, v)
+
+
+def test_cached_seeds_give_the_same_lines(field, tmp_path, monkeypatch):
+    monkeypatch.setenv('GEOCAT_EXAMPLES_CACHE', str(tmp_path))
+    x, y, u, v = field
+    first = streamlines(x, y, u, v, density=2, cache=True)
+    assert list((tmp_path / 'streamlines').iterdir())
+    second = streamlines(x, y, u, v, density=2, cache=True)
+    assert len(second) == len(first)
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+import xarray as xr
+from matplotlib.figure import Figure
+
+from gallery_tools import thinning
+from gallery_tools.thinning import thin, thin_indices
+
+LAT = np.arange(-88.75, 90, 2.5)
+LON = np.arange(0., 360., 2.5)
+
+
+@pytest.fixture
+def ax():
+    ax = Figure(figsize=(6, 4), dpi=100).add_subplot()
+    ax.set_xlim(-20, 380)
+    ax.set_ylim(-60, 60)
+    return ax
+
+
+@pytest.fixture
+def geoaxes():
+    ccrs = pytest.importorskip('cartopy.crs')
+    ax = Figure(figsize=(6, 4), dpi=100).add_subplot(projection=ccrs.Robinson(central_longitude=150))
+    ax.set_global()
+    return ax, ccrs.PlateCarree()
+
+
+def straightforward(ax, spacing, transform=None):
+    """Project every grid point and keep, per cell, the one closest to the cell's centre."""
+    lon, lat = np.meshgrid(LON, LAT)
+    x, y = lon.ravel(), lat.ravel()
+    if transform is not None:
+        x, y = ax.projection.transform_points(transform, x, y)[:, :2].T
+    ax.apply_aspect()
+    bbox = ax.bbox
+    best = {}
+    for k, (px, py) in enumerate(ax.transData.transform(np.column_stack([x, y]))):
+        if not (bbox.x0 <= px <= bbox.x1 and bbox.y0 <= py <= bbox.y1):
+            continue
+        cell = ((px - bbox.x0) // spacing, (py - bbox.y0) // spacing)
+        distance = np.hypot((px - bbox.x0) % spacing - spacing / 2,
+                            (py - bbox.y0) % spacing - spacing / 2)
+        if cell not in best or distance < best[cell][0]:
+            best[cell] = (distance, k)
+    return np.divmod(np.sort([k for _, k in best.values()]), len(LON))
+
+
+@pytest.mark.parametrize('spacing', [7., 20., 45.])
+def test_indices_match_projecting_every_point(ax, spacing):
+    j, i = thin_indices(ax, LAT, LON, spacing)
+    expected_j, expected_i = straightforward(ax, spacing)
+    np.testing.assert_array_equal(j, expected_j)
+    np.testing.assert_array_equal(i, expected_i)
+
+
+def test_indices_on_a_map(geoaxes, monkeypatch):
+    ax, transform = geoaxes
+    # Several blocks of rows
+    monkeypatch.setattr(thinning, 'BLOCK_POINTS', 1000)
+    j, i = thin_indices(ax, LAT, LON, 15., transform=transform)
+    expected_j, expected_i = straightforward(ax, 15., transform)
+    np.testing.assert_array_equal(j, expected_j)
+    np.testing.assert_array_equal(i, expected_i)
+
+
+def test_one_point_per_cell_and_none_outside(ax):
+    spacing = 20.
+    j, i = thin_indices(ax, LAT, LON, spacing)
+    px, py = ax.transData.transform(np.column_stack([LON[i], LAT[j]])).T
+    bbox = ax.bbox
+    assert ((px >= bbox.x0) & (px <= bbox.x1) & (py >= bbox.y0) & (py <= bbox.y1)).all()
+    cells = set(zip(((px - bbox.x0) // spacing).tolist(), ((py - bbox.y0) // spacing).tolist()))
+    assert len(cells) == len(j)
+    # Rows beyond the y limits are dropped, the ones next to them are kept
+    assert np.abs(LAT[j]).max() <= 60
+    assert np.abs(LAT[j]).max() > 55
+
+
+def test_thin_matches_direct_indexing(geoaxes):
+    ax, transform = geoaxes
+    rng = np.random.default_rng(0)
+    ds = xr.Dataset({'U': (('time', 'lat', 'lon'), rng.normal(size=(2, len(LAT), len(LON)))),
+                     'V': (('lat', 'lon'), rng.normal(size=(len(LAT), len(LON))))},
+                    coords={'lat': LAT, 'lon': LON})
+    arrows = thin(ds, ax, spacing=15., transform=transform)
+    j, i = thin_indices(ax, LAT, LON, 15., transform=transform)
+    expected = ds.isel(lat=xr.DataArray(j, dims='point'), lon=xr.DataArray(i, dims='point'))
+    xr.testing.assert_identical(arrows, expected)
@@ -0,0 +1,105 @@
+"""
+Vector thinning by a minimum spacing on screen, as NCL's ``vcMinDistanceF``.
+
+The vector examples pick the arrows to draw with strides tuned by hand for
+one file and one figure: ``lon=slice(0,-1,3), lat=slice(1,-1,3)`` in
+``NCL_vector_3``, ``slice(0,-1,5)``/``slice(2,-1,3)`` in ``NCL_vector_4``
+and ``slice(None, None, 4)`` in ``NCL_panel_1``.  :func:`thin` instead
+chooses the grid points from where they land on the axes: the points are
+projected to display (pixel) coordinates through the map projection and the
+axes' current extent, size and dpi, binned into square cells of ``spacing``
+pixels, and the point closest to the centre of each cell is kept.  Only the
+rows and columns holding a selected point are then read::
+
+    ax.set_global()
+    arrows = thin(ds.isel(time=1), ax, spacing=20, transform=ccrs.PlateCarree())
+    ax.quiver(arrows.lon, arrows.lat, arrows.U, arrows.V, transform=ccrs.PlateCarree())
+
+The axes must have their final position and extent before thinning; with
+``constrained_layout`` call ``fig.draw_without_rendering()`` first.
+"""
+
+import numpy as np
+import xarray as xr
+
+# Grid points projected at a time, to bound memory on fine grids
+BLOCK_POINTS = 2**20
+
+
+def _closest_per_cell(cell, distance):
+    """Return the positions of the smallest ``distance`` for each distinct ``cell``."""
+    order = np.lexsort((distance, cell))
+    return order[np.r_[True, cell[order][1:] != cell[order][:-1]]]
+
+
+def thin_indices(ax, lat, lon, spacing=20., transform=None):
+    """Return the ``(lat, lon)`` indices of the grid points to draw on ``ax``.
+
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        The axes the vectors are drawn on, possibly a Cartopy ``GeoAxes``.
+    lat, lon : array-like
+        1-D grid coordinates.
+    spacing : float
+        Size of the cells, in pixels at the figure's dpi, of which each
+        holds at most one selected point.
+    transform : cartopy.crs.CRS, optional
+        Coordinate system of ``lon`` and ``lat`` on a ``GeoAxes``; they are
+        in data coordinates otherwise.
+
+    Returns
+    -------
+    j, i : ndarray of int
+        Latitude and longitude indices of the selected points, in row-major
+        order.  Points outside the axes are never selected.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    # Fixed-aspect axes (all maps) only shrink to their final box when drawn
+    ax.apply_aspect()
+    bbox = ax.bbox
+    # Points on the right edge (px == bbox.x1) get a cell of their own
+    ncells = int(bbox.width // spacing) + 1
+
+    flat = np.empty(0, np.int64)
+    cells = np.empty(0, np.int64)
+    distances = np.empty(0)
+    rows = max(BLOCK_POINTS // max(len(lon), 1), 1)
+    for start in range(0, len(lat), rows):
+        y, x = np.meshgrid(lat[start:start + rows], lon, indexing='ij')
+        x, y = x.ravel(), y.ravel()
+        if transform is not None and hasattr(ax, 'projection'):
+            x, y = ax.projection.transform_points(transform, x, y)[:, :2].T
+        with np.errstate(invalid='ignore'):
+            px, py = ax.transData.transform(np.column_stack([x, y])).T
+            inside = ((px >= bbox.x0) & (px <= bbox.x1) & (py >= bbox.y0) & (py <= bbox.y1))
+        index = start * len(lon) + np.flatnonzero(inside)
+        cx, fx = np.divmod(px[inside] - bbox.x0, spacing)
+        cy, fy = np.divmod(py[inside] - bbox.y0, spacing)
+        cell = cy.astype(np.int64) * ncells + cx.astype(np.int64)
+        distance = np.hypot(fx - spacing / 2, fy - spacing / 2)
+
+        # Keep only each cell's best point so far
+        cells = np.concatenate([cells, cell])
+        distances = np.concatenate([distances, distance])
+        flat = np.concatenate([flat, index])
+        best = _closest_per_cell(cells, distances)
+        cells, distances, flat = cells[best], distances[best], flat[best]
+
+    return np.divmod(np.sort(flat), len(lon))
+
+
+def thin(obj, ax, spacing=20., transform=None, lat_dim='lat', lon_dim='lon', dim='point'):
+    """Return the points of ``obj`` to draw as vectors on ``ax``, along a new dimension ``dim``.
+
+    The points are chosen by :func:`thin_indices`.  ``obj`` (a ``Dataset``
+    or ``DataArray``, possibly lazily loaded) is first indexed with the rows
+    and columns that hold a selected point, so that only those are read,
+    then with the points themselves.
+    """
+    j, i = thin_indices(ax, obj[lat_dim], obj[lon_dim], spacing, transform)
+    rows, row = np.unique(j, return_inverse=True)
+    cols, col = np.unique(i, return_inverse=True)
+    block = obj.isel({lat_dim: rows, lon_dim: cols})
+    return block.isel({lat_dim: xr.DataArray(row, dims=dim), lon_dim: xr.DataArray(col, dims=dim)})